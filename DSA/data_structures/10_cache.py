@@ -0,0 +1,289 @@
+# A cache keeps the results of expensive work so that asking for the same thing again is cheap
+# it has a limited capacity, so when it is full it has to evict (throw away) an entry to make room for a new one
+# LRU - Least Recently Used: evict the entry that hasnt been read or written for the longest time
+# LFU - Least Frequently Used: evict the entry that was used the fewest times (ties are broken by LRU)
+# TTL - Time To Live: an entry expires after a number of seconds, even if there is still room for it
+
+# We build it from our own data structures
+# HashMap (5_hashmap.py) - key -> node in a DoublyLinkedList, so that we find an entry in O(1)
+# DoublyLinkedList (2_doubly_linked_list.py) - keeps the entries in eviction order, and because we hold the node (the handle)
+# we can unlink it or move it to the back in O(1) without searching for it
+
+import importlib
+import os
+import sys
+import time
+from functools import wraps
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))) # the modules start with a digit, so we load them with importlib
+DoublyLinkedList = importlib.import_module("2_doubly_linked_list").DoublyLinkedList
+HashMap = importlib.import_module("5_hashmap").HashMap
+
+
+class CacheEntry:
+    def __init__(self, key, value, size, expires_at):
+        self.key = key
+        self.value = value
+        self.size = size # estimated size in bytes, only used when the cache has a max_bytes limit
+        self.expires_at = expires_at # None if the entry never expires
+        self.frequency = 1 # number of times the entry was used, only used by the LFU cache
+
+    def __repr__(self):
+        return f"({self.key}, {self.value})"
+
+
+class LRUCache:
+    def __init__(self, max_items = None, max_bytes = None, ttl = None, size_of = sys.getsizeof, clock = time.monotonic):
+        if max_items is None and max_bytes is None:
+            raise ValueError("Either max_items or max_bytes is required")
+        self.max_items = max_items # max number of entries
+        self.max_bytes = max_bytes # max total estimated size of the keys and values
+        self.ttl = ttl # default number of seconds an entry lives, None means forever
+        self.size_of = size_of # function used to estimate the size of a key or value
+        self.clock = clock
+        self.bytes = 0 # total estimated size of all entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0 # entries thrown away to make room
+        self.expirations = 0 # entries thrown away because their ttl ran out
+        self.map = HashMap(capacity = max(16, max_items or 1024)) # key -> node holding the CacheEntry
+        self._init_order()
+
+    # O(1)
+    def __len__(self):
+        return len(self.map)
+
+    # O(1) - doesnt count as a hit or a miss and doesnt change the eviction order
+    def __contains__(self, key):
+        node = self._find(key)
+        return node is not None and not self._expired(node.value)
+
+    # O(n)
+    def __repr__(self):
+        return str([node.value for _, node in self.map.items()]) # the map holds nodes, the nodes hold the entries
+
+    # O(1)
+    def get(self, key, default = None):
+        node = self._find(key)
+        if node is None:
+            self.misses += 1
+            return default
+        entry = node.value
+        if self._expired(entry):
+            self._remove(key, node)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._touch(key, node)
+        return entry.value
+
+    # O(1) - amortized, each evicted entry was added by an earlier put
+    def put(self, key, value, ttl = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else self.clock() + ttl
+        size = self.size_of(key) + self.size_of(value) if self.max_bytes is not None else 0
+        node = self._find(key)
+        if node is not None: # the key is already cached, so we update it in place
+            entry = node.value
+            self.bytes += size - entry.size
+            entry.value, entry.size, entry.expires_at = value, size, expires_at
+            self._touch(key, node)
+        else:
+            if self.max_bytes is not None and size > self.max_bytes: # it would never fit, so we dont cache it
+                return
+            while len(self.map) and self._over_capacity(1, size): # we make room first, so that the new entry isnt the one evicted
+                self._evict()
+            self.bytes += size
+            self.map.put(key, self._add(CacheEntry(key, value, size, expires_at)))
+        while len(self.map) and self._over_capacity():
+            self._evict()
+
+    # O(1)
+    def remove(self, key):
+        node = self._find(key)
+        if node is None:
+            raise KeyError("Key not present")
+        self._remove(key, node)
+
+    # O(n)
+    def clear(self):
+        self.map = HashMap(capacity = len(self.map.buckets))
+        self.bytes = 0
+        self._init_order()
+
+    # O(1)
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "items": len(self.map),
+            "bytes": self.bytes,
+        }
+
+    # helper methods
+
+    # O(1)
+    def _find(self, key): # returns the node of the key or None
+        try:
+            return self.map.get(key)
+        except KeyError:
+            return None
+
+    # O(1)
+    def _expired(self, entry):
+        return entry.expires_at is not None and entry.expires_at <= self.clock()
+
+    # O(1)
+    def _over_capacity(self, extra_items = 0, extra_bytes = 0): # would the cache be over a limit after adding the extra items and bytes
+        return (self.max_items is not None and len(self.map) + extra_items > self.max_items) or (self.max_bytes is not None and self.bytes + extra_bytes > self.max_bytes)
+
+    # O(1)
+    def _remove(self, key, node): # removes the entry from both the map and the eviction order
+        self.map.remove(key)
+        self._unlink(node)
+        self.bytes -= node.value.size
+
+    # O(1)
+    def _evict(self):
+        node = self._victim()
+        entry = node.value
+        self._remove(entry.key, node)
+        if self._expired(entry):
+            self.expirations += 1
+        else:
+            self.evictions += 1
+
+    # The methods below define the eviction policy, the LFU cache overrides them
+
+    def _init_order(self):
+        self.order = DoublyLinkedList() # least recently used at the head, most recently used at the tail
+
+    # O(1)
+    def _add(self, entry): # links a new entry and returns its node
+        return self.order.append(entry, return_handle = True)
+
+    # O(1)
+    def _touch(self, key, node): # the entry was used, so it is now the most recently used
+        self.order.move_to_back(node)
+
+    # O(1)
+    def _unlink(self, node):
+        self.order.remove_node(node)
+
+    # O(1)
+    def _victim(self): # the node to evict
+        return self.order.head
+
+
+class LFUCache(LRUCache):
+    # We keep one DoublyLinkedList per frequency (frequency -> list of entries used that many times)
+    # inside a list the least recently used entry is at the head, so ties are evicted in LRU order
+    # min_frequency is the smallest frequency that has entries, the victim is the head of its list
+
+    def _init_order(self):
+        self.frequencies = HashMap(capacity = 64) # frequency -> DoublyLinkedList of nodes
+        self.min_frequency = 1
+
+    # O(1)
+    def _add(self, entry):
+        self.min_frequency = 1 # a new entry always has the lowest frequency
+        return self._frequency_list(1).append(entry, return_handle = True)
+
+    # O(1)
+    def _touch(self, key, node):
+        # move the entry from the list of its frequency to the list of the next frequency
+        entry = node.value
+        self._unlink(node)
+        if self.min_frequency == entry.frequency and entry.frequency not in self.frequencies:
+            self.min_frequency += 1 # the list we took it from is now gone
+        entry.frequency += 1
+        self.map.put(key, self._frequency_list(entry.frequency).append(entry, return_handle = True)) # the entry has a new node, so we update the map
+
+    # O(1)
+    def _unlink(self, node):
+        frequency = node.value.frequency
+        frequency_list = self.frequencies.get(frequency)
+        frequency_list.remove_node(node)
+        if len(frequency_list) == 0: # we drop empty lists so that the map only holds frequencies that are in use
+            self.frequencies.remove(frequency)
+
+    # O(1) - usually, the min frequency only has to skip past frequencies whose lists were emptied
+    def _victim(self):
+        while self.min_frequency not in self.frequencies:
+            self.min_frequency += 1
+        return self.frequencies.get(self.min_frequency).head
+
+    # O(1)
+    def _frequency_list(self, frequency): # returns the list for the frequency, creating it if needed
+        try:
+            return self.frequencies.get(frequency)
+        except KeyError:
+            frequency_list = DoublyLinkedList()
+            self.frequencies.put(frequency, frequency_list)
+            return frequency_list
+
+
+def memoize(cache = None, **cache_options):
+    # decorator that caches the results of a function by its arguments
+    # pass a cache object, or the options for a new LRUCache (max_items = 128 if none are given)
+    # the arguments must be usable as keys, like they would be for a dict
+    if cache is None:
+        cache = LRUCache(**(cache_options or {"max_items": 128}))
+
+    def decorator(func):
+        missing = object() # a marker so that results which are None are cached too
+        keyword_mark = object() # separates the positional and keyword arguments in a key, so f(x = 1) and f((), (('x', 1),)) get different keys
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = args + (keyword_mark,) + tuple(sorted(kwargs.items())) if kwargs else args
+            result = cache.get(key, missing)
+            if result is missing:
+                result = func(*args, **kwargs)
+                cache.put(key, result)
+            return result
+
+        wrapper.cache = cache # so that the caller can look at the stats or clear it
+        return wrapper
+    return decorator
+
+
+if __name__ == "__main__":
+    lru = LRUCache(max_items = 3)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    lru.put('c', 3)
+    lru.get('a')
+    lru.put('d', 4) # evicts 'b', the least recently used
+
+    print(lru)
+    print('b' in lru)
+    print(lru.stats())
+
+    lfu = LFUCache(max_items = 2)
+    lfu.put('a', 1)
+    lfu.put('b', 2)
+    lfu.get('a')
+    lfu.get('a')
+    lfu.put('c', 3) # evicts 'b', the least frequently used
+
+    print(lfu)
+    print(lfu.stats())
+
+    ttl_cache = LRUCache(max_items = 10, ttl = 0.01)
+    ttl_cache.put('a', 1)
+    time.sleep(0.02)
+    print(ttl_cache.get('a'))
+    print(ttl_cache.stats())
+
+    @memoize(max_items = 100)
+    def fibonacci(n):
+        return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+    print(fibonacci(80))
+    print(fibonacci.cache.stats())
@@ -0,0 +1,191 @@
+# asyncio versions of the queue (4_queue.py) and the stack (3_stack.py)
+# put and get are coroutines, so a producer or consumer that has to wait suspends and lets the other tasks run
+# Backpressure with watermarks:
+# when the number of items reaches the high watermark, producers are suspended in put
+# they are only resumed once consumers bring it down to the low watermark
+# the gap between the two means producers dont flip between running and waiting on every single item
+# Cancellation safety: an item is only added or removed after the wait is over, in code that has no await in it
+# so cancelling a task that is waiting in put or get never loses an item or adds one twice
+
+import asyncio
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))) # the modules start with a digit, so we load them with importlib
+RingBufferQueue = importlib.import_module("4_queue").RingBufferQueue
+ArrayStack = importlib.import_module("3_stack").ArrayStack
+
+
+class AsyncQueue:
+    def __init__(self, high_watermark = 1024, low_watermark = None):
+        if high_watermark < 1:
+            raise ValueError("High watermark must be at least 1")
+        if low_watermark is None:
+            low_watermark = high_watermark // 2
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("Low watermark must be between 0 and the high watermark")
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.items = self._make_storage()
+        self.readable = asyncio.Event() # set while there are items
+        self.writable = asyncio.Event() # set while producers are allowed to put
+        self.writable.set()
+
+    # O(1) - constant time
+    def __len__(self):
+        return len(self.items)
+
+    # O(n) - linear time
+    def __repr__(self):
+        return repr(self.items)
+
+    # O(1) - constant time, plus the time spent suspended by backpressure
+    async def put(self, value):
+        while not self.writable.is_set():
+            await self.writable.wait()
+        self.put_nowait(value)
+
+    # O(1) - constant time
+    def put_nowait(self, value):
+        # adds the value even if producers are paused, use put to respect the watermarks
+        self._push(value)
+        self._update_events()
+
+    # O(1) - constant time, plus the time spent waiting for an item
+    async def get(self):
+        while not self.readable.is_set():
+            await self.readable.wait()
+        return self.get_nowait()
+
+    # O(1) - constant time
+    def get_nowait(self):
+        if not len(self.items):
+            raise IndexError("Queue is empty")
+        value = self._pop()
+        self._update_events()
+        return value
+
+    # O(k) - where k is the number of items returned, plus the time spent waiting for the first one
+    async def get_batch(self, n):
+        # waits for at least one item and returns up to n of them
+        while not self.readable.is_set():
+            await self.readable.wait()
+        values = self._pop_many(n)
+        self._update_events()
+        return values
+
+    # O(1) - constant time
+    def is_empty(self):
+        return not len(self.items)
+
+    # helper methods, the stack overrides them
+
+    def _make_storage(self):
+        return RingBufferQueue(capacity = min(self.high_watermark, 1024), shrink = True)
+
+    def _push(self, value):
+        self.items.enqueue(value)
+
+    def _pop(self):
+        return self.items.dequeue()
+
+    def _pop_many(self, n):
+        return self.items.dequeue_many(n)
+
+    # O(1)
+    def _update_events(self): # wakes the consumers or the producers after the number of items changed
+        size = len(self.items)
+        if size:
+            self.readable.set()
+        else:
+            self.readable.clear()
+        if size >= self.high_watermark:
+            self.writable.clear() # suspend the producers
+        elif size <= self.low_watermark:
+            self.writable.set() # resume the producers
+
+
+class AsyncStack(AsyncQueue):
+    # same interface as AsyncQueue, but get returns the item that was put last (LIFO)
+
+    def _make_storage(self):
+        return ArrayStack()
+
+    def _push(self, value):
+        self.items.push(value)
+
+    def _pop(self):
+        return self.items.pop()
+
+    def _pop_many(self, n):
+        return self.items.pop_many(min(n, len(self.items)))
+
+
+async def benchmark(n = 200_000, high_watermark = 1024):
+    # moves n items from one producer task to one consumer task and compares with asyncio.Queue
+    import time
+
+    async def run(queue, get_items):
+        async def producer():
+            for i in range(n):
+                await queue.put(i)
+
+        async def consumer():
+            received = 0
+            while received < n:
+                received += await get_items(queue)
+
+        start = time.perf_counter()
+        await asyncio.gather(producer(), consumer())
+        return time.perf_counter() - start
+
+    async def get_one(queue):
+        await queue.get()
+        return 1
+
+    async def get_batch(queue):
+        return len(await queue.get_batch(256))
+
+    cases = (
+        ("asyncio.Queue", lambda: asyncio.Queue(maxsize = high_watermark), get_one),
+        ("AsyncQueue.get", lambda: AsyncQueue(high_watermark), get_one),
+        ("AsyncQueue.get_batch", lambda: AsyncQueue(high_watermark), get_batch),
+    )
+    for name, make, get_items in cases:
+        elapsed = await run(make(), get_items)
+        print(f"{name:>20}: {n / elapsed / 1e3:8.1f} K items/s")
+
+
+if __name__ == "__main__":
+    async def main():
+        queue = AsyncQueue(high_watermark = 4, low_watermark = 1)
+        consumed = []
+
+        async def producer():
+            for i in range(10):
+                await queue.put(i) # suspends once 4 items are waiting
+
+        async def consumer():
+            while len(consumed) < 10:
+                consumed.extend(await queue.get_batch(3))
+                await asyncio.sleep(0)
+
+        await asyncio.gather(producer(), consumer())
+        print(consumed)
+
+        stack = AsyncStack(high_watermark = 10)
+        for i in range(5):
+            await stack.put(i)
+        print(await stack.get())
+        print(await stack.get_batch(2))
+        print(stack)
+
+        waiting = asyncio.ensure_future(AsyncQueue().get())
+        await asyncio.sleep(0)
+        waiting.cancel() # cancelling a waiting get doesnt take anything from the queue
+
+        if "--bench" in sys.argv:
+            await benchmark()
+
+    asyncio.run(main())
@@ -0,0 +1,207 @@
+# A FIFO queue (like 4_queue.py) that lives in shared memory, so that separate processes can use it
+# multiprocessing.Queue pickles every item and sends it through a pipe, here the producer writes the bytes straight into
+# memory that the consumer process can read, so there is no pickling and only one copy (or none, with read_view)
+
+# The memory is laid out like a ring buffer with fixed size slots:
+# [ head (8 bytes) | tail (8 bytes) | slots (8 bytes) | slot size (8 bytes) | slot 0 | slot 1 | ... | slot n - 1 ]
+# every slot is [ length (4 bytes) | payload (slot_size bytes) ]
+# head and tail only ever grow, the slot of a counter is counter % slots and the number of items is tail - head
+# the producer only writes tail and the consumer only writes head, so one producer and one consumer need no lock
+# the producer fills the slot before it moves the tail, so the consumer never sees a half written slot
+# with several producers (multi_producer = True) they take turns with a multiprocessing lock, the consumer still needs none
+# the lock cant be found by name, so a process that attaches by name must be given the lock of the creating process (queue.lock)
+# the layout is written in the header, so attaching with a different number of slots or slot size is caught instead of misreading the slots
+
+import struct
+import time
+from contextlib import contextmanager
+from multiprocessing import Lock, shared_memory
+
+HEADER = struct.Struct("QQQQ") # head, tail, slots, slot size
+COUNTERS = struct.Struct("QQ") # head, tail, the part of the header that changes
+LENGTH = struct.Struct("I") # length prefix of each slot
+
+
+class SharedMemoryQueue:
+    def __init__(self, slots, slot_size = None, record_format = None, name = None, create = True, multi_producer = False, lock = None):
+        # pass record_format (a struct format like 'qd') to store fixed size records, else the slots hold bytes of up to slot_size
+        # the process that creates the queue uses create = True, the others can attach by name, or just receive the queue
+        # object as a Process argument, it is pickled as its name (and its lock) and reattached on the other side
+        # attaching to a multi producer queue by name needs lock = the creating queue's lock, else the producers would overwrite each other
+        if slots < 1:
+            raise ValueError("Slots must be at least 1")
+        self.record = struct.Struct(record_format) if record_format is not None else None
+        if self.record is not None:
+            slot_size = self.record.size
+        if slot_size is None or slot_size < 1:
+            raise ValueError("Either record_format or a positive slot_size is required")
+        self.slots = slots
+        self.slot_size = slot_size
+        self.record_format = record_format
+        self.stride = LENGTH.size + slot_size # bytes per slot
+        self.multi_producer = multi_producer
+        if multi_producer and lock is None:
+            if not create:
+                raise ValueError("Attaching to a multi producer queue needs the lock of the queue that created it")
+            lock = Lock()
+        self.lock = lock if multi_producer else None
+        size = HEADER.size + slots * self.stride
+        self.memory = shared_memory.SharedMemory(name = name, create = create, size = size if create else 0)
+        self.buffer = self.memory.buf
+        if create:
+            HEADER.pack_into(self.buffer, 0, 0, 0, slots, slot_size)
+        elif self.memory.size < size or HEADER.unpack_from(self.buffer, 0)[2:] != (slots, slot_size):
+            self.close()
+            raise ValueError("slots and slot_size dont match the shared memory of the queue")
+
+    # O(1) - constant time
+    def __len__(self):
+        head, tail = COUNTERS.unpack_from(self.buffer, 0)
+        return tail - head
+
+    # send only the name and layout to other processes, they attach to the same memory
+    def __getstate__(self):
+        return (self.slots, self.slot_size, self.record_format, self.memory.name, self.multi_producer, self.lock)
+
+    def __setstate__(self, state):
+        slots, slot_size, record_format, name, multi_producer, lock = state
+        self.__init__(slots, slot_size, record_format, name = name, create = False, multi_producer = multi_producer, lock = lock)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    # O(k) - where k is the length of the payload
+    def enqueue(self, payload, timeout = 0):
+        # copies a bytes like payload into the next free slot
+        # if the queue is full we poll for up to timeout seconds and then raise IndexError
+        if len(payload) > self.slot_size:
+            raise ValueError("Payload is larger than the slot size")
+        with self._producer():
+            offset, tail = self._free_slot(timeout)
+            LENGTH.pack_into(self.buffer, offset, len(payload))
+            self.buffer[offset + LENGTH.size:offset + LENGTH.size + len(payload)] = payload
+            self._publish(tail)
+
+    # O(1) - for a fixed size record
+    def enqueue_record(self, *values, timeout = 0):
+        # packs the values straight into the slot, with no bytes object in between
+        with self._producer():
+            offset, tail = self._free_slot(timeout)
+            LENGTH.pack_into(self.buffer, offset, self.record.size)
+            self.record.pack_into(self.buffer, offset + LENGTH.size, *values)
+            self._publish(tail)
+
+    # O(k) - where k is the length of the payload
+    def dequeue(self, timeout = 0):
+        # returns a copy of the front payload as bytes
+        with self.read_view(timeout) as view:
+            return bytes(view)
+
+    # O(1) - for a fixed size record
+    def dequeue_record(self, timeout = 0):
+        with self.read_view(timeout) as view:
+            return self.record.unpack_from(view)
+
+    @contextmanager
+    def read_view(self, timeout = 0):
+        # zero copy read: gives a memoryview of the front payload inside the shared memory
+        # the slot is only handed back to the producers when the with block ends, so the view must not be used after it
+        head = self._wait(lambda head, tail: tail > head, timeout, "Queue is empty")
+        offset = self._offset(head)
+        length = LENGTH.unpack_from(self.buffer, offset)[0]
+        view = self.buffer[offset + LENGTH.size:offset + LENGTH.size + length]
+        try:
+            yield view
+        finally:
+            view.release()
+            struct.pack_into("Q", self.buffer, 0, head + 1) # move the head, the slot can be reused now
+
+    # O(1) - constant time
+    def is_empty(self):
+        return len(self) == 0
+
+    # O(1) - detaches this process from the memory
+    def close(self):
+        self.buffer = None
+        self.memory.close()
+
+    # O(1) - frees the memory, called once by the process that created the queue, after every process closed it
+    def unlink(self):
+        self.memory.unlink()
+
+    # helper methods
+
+    # O(1)
+    def _offset(self, counter): # where the slot of a head or tail counter starts
+        return HEADER.size + (counter % self.slots) * self.stride
+
+    # O(1)
+    def _producer(self): # with several producers they take turns, else there is nothing to lock
+        return self.lock if self.lock is not None else _NoLock()
+
+    # O(1) - plus the time spent polling
+    def _free_slot(self, timeout): # returns the offset of the slot at the tail and the tail
+        tail = self._wait(lambda head, tail: tail - head < self.slots, timeout, "Queue is full", tail = True)
+        return self._offset(tail), tail
+
+    # O(1)
+    def _publish(self, tail): # moving the tail makes the slot visible to the consumer
+        struct.pack_into("Q", self.buffer, 8, tail + 1)
+
+    # O(1) - plus the time spent polling
+    def _wait(self, ready, timeout, message, tail = False): # polls until ready(head, tail) or the timeout, returns head (or tail)
+        deadline = time.monotonic() + timeout
+        delay = 0.00001
+        while True:
+            head, current_tail = COUNTERS.unpack_from(self.buffer, 0)
+            if ready(head, current_tail):
+                return current_tail if tail else head
+            if time.monotonic() >= deadline:
+                raise IndexError(message)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.001) # back off, so that a long wait doesnt burn a core
+
+
+class _NoLock: # stands in for the producer lock when there is a single producer
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _producer(queue, start, count):
+    for i in range(start, start + count):
+        queue.enqueue_record(i, i * 0.5, timeout = 5)
+    queue.close()
+
+
+if __name__ == "__main__":
+    from multiprocessing import Process
+
+    queue = SharedMemoryQueue(slots = 64, record_format = 'qd', multi_producer = True)
+    workers = [Process(target = _producer, args = (queue, n * 1000, 1000)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+
+    total = 0
+    for _ in range(4000):
+        number, half = queue.dequeue_record(timeout = 5)
+        total += number
+    for worker in workers:
+        worker.join()
+    print(total)
+    print(len(queue))
+
+    queue.close()
+    queue.unlink()
+
+    byte_queue = SharedMemoryQueue(slots = 4, slot_size = 32)
+    byte_queue.enqueue(b"hello")
+    byte_queue.enqueue(b"world")
+    print(byte_queue.dequeue())
+    with byte_queue.read_view() as view:
+        print(view.tobytes())
+    byte_queue.close()
+    byte_queue.unlink()
@@ -0,0 +1,279 @@
+# A HashMap (like 5_hashmap.py) that lives in a file instead of in python objects
+# the file is memory mapped (mmap), so the OS loads the pages we touch on demand and keeps them in its page cache
+# opening a map of many GB is instant because nothing is read up front, and every process that maps the file shares the same cached pages
+
+# Keys and values must have a fixed width so that every slot has the same size:
+# a struct format like 'q' (64 bit int) or 'd' (float), or an int n for bytes of up to n bytes (stored with a 2 byte length in front)
+
+# The file is laid out like the open addressing map in 5_hashmap.py, but with plain linear probing (no Robin Hood swaps):
+# [ header (64 bytes) | slot 0 | slot 1 | ... | slot capacity - 1 ]
+# every slot is [ used (1 byte) | hash (8 bytes) | key | value ]
+# we use linear probing, and backward shift deletion so there are no tombstones (a key after the hole moves back into it if that doesnt put it before its home slot)
+# the hash is blake2b of the packed key, not python's hash(), because hash() of str and bytes changes every time python starts
+
+# Compaction (append then swap) - to grow or shrink we write every entry into a new file next to the old one, flush it to disk,
+# and then rename it over the old file. A rename is atomic, so after a crash the file is either the complete old map or the complete new one
+# Writes to the mapped pages (put, remove) are not crash safe on their own, call flush() to push them to disk
+
+import hashlib
+import mmap
+import os
+import struct
+
+MAGIC = b"DSAHMAP1"
+HEADER = struct.Struct("<8s16s16sQQ") # magic, key format, value format, capacity, count
+FORMAT_SIZE = 16 # bytes for each format in the header, a longer one would be cut off and read back as a different format
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<BQ") # used, hash
+
+
+class _Field: # packs a key or a value into its fixed width
+    def __init__(self, spec):
+        self.spec = str(spec)
+        if isinstance(spec, int) or self.spec.isdigit(): # bytes of up to n bytes
+            self.max_length = int(spec)
+            self.struct = struct.Struct(f"<H{self.max_length}s")
+        else:
+            self.max_length = None
+            self.struct = struct.Struct("<" + self.spec)
+        self.size = self.struct.size
+
+    def pack(self, value):
+        if self.max_length is None:
+            return self.struct.pack(value)
+        if len(value) > self.max_length:
+            raise ValueError(f"Bytes are longer than {self.max_length}")
+        return self.struct.pack(len(value), bytes(value))
+
+    def unpack_from(self, buffer, offset):
+        if self.max_length is None:
+            return self.struct.unpack_from(buffer, offset)[0]
+        length, data = self.struct.unpack_from(buffer, offset)
+        return data[:length]
+
+
+class DiskHashMap:
+    def __init__(self, path, key_format = None, value_format = None, capacity = 1024, max_load_factor = 0.7):
+        # if the file exists we open it (the formats are read from the file), else we create it with the given formats
+        self.path = path
+        self.max_load_factor = max_load_factor
+        if not os.path.exists(path):
+            if key_format is None or value_format is None:
+                raise ValueError("key_format and value_format are required to create a map")
+            self._create(path, key_format, value_format, _power_of_two(capacity))
+        self._open()
+
+    # O(1)
+    def __len__(self):
+        return self.count
+
+    # Average: O(1)
+    def __contains__(self, key):
+        return self._find(self.keys_field.pack(key))[0] >= 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # Average: O(1) - amortized, because of the compaction when the map grows
+    def put(self, key, value):
+        packed_key = self.keys_field.pack(key)
+        packed_value = self.values_field.pack(value)
+        index, key_hash = self._find(packed_key)
+        if index >= 0: # the key is present, so we overwrite the value in place
+            self.map[self._offset(index) + self.value_offset:self._offset(index) + self.slot_size] = packed_value
+            return
+        if self.count + 1 > self.capacity * self.max_load_factor:
+            self.compact(self.capacity * 2)
+        self._insert(key_hash, packed_key + packed_value)
+        self._set_count(self.count + 1)
+
+    # Average: O(1)
+    def get(self, key):
+        index = self._find(self.keys_field.pack(key))[0]
+        if index < 0:
+            raise KeyError("Key not present")
+        return self.values_field.unpack_from(self.map, self._offset(index) + self.value_offset)
+
+    # Average: O(1)
+    def remove(self, key):
+        index = self._find(self.keys_field.pack(key))[0]
+        if index < 0:
+            raise KeyError("Key not present")
+        mask = self.capacity - 1
+        next_index = index
+        while True: # backward shift: a later key in the run moves into the hole, unless its home slot is after the hole
+            next_index = (next_index + 1) & mask
+            used, next_hash = SLOT_HEADER.unpack_from(self.map, self._offset(next_index))
+            if not used:
+                break
+            if (next_index - (next_hash & mask)) & mask < (next_index - index) & mask: # its home is between the hole and itself, so it stays
+                continue
+            self.map[self._offset(index):self._offset(index) + self.slot_size] = self.map[self._offset(next_index):self._offset(next_index) + self.slot_size]
+            index = next_index
+        self.map[self._offset(index):self._offset(index) + self.slot_size] = bytes(self.slot_size)
+        self._set_count(self.count - 1)
+
+    # O(m) - m is the number of slots, the entries are read lazily one at a time
+    def items(self):
+        for index in range(self.capacity):
+            offset = self._offset(index)
+            if self.map[offset]:
+                yield self.keys_field.unpack_from(self.map, offset + SLOT_HEADER.size), self.values_field.unpack_from(self.map, offset + self.value_offset)
+
+    # O(m)
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    # O(m)
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    # O(m) - writes the dirty pages to disk
+    def flush(self):
+        self.map.flush()
+
+    # O(n + m) - rewrites the map into a new file and swaps it in
+    def compact(self, capacity = None):
+        # with no capacity we pick the smallest one that keeps the load factor under half of the max
+        if capacity is None:
+            capacity = _power_of_two(max(1, int(self.count / (self.max_load_factor / 2))))
+        capacity = _power_of_two(capacity)
+        if self.count > capacity * self.max_load_factor:
+            raise ValueError("Capacity is too small for the entries")
+        temporary_path = self.path + ".compact"
+        if os.path.exists(temporary_path): # left over from a compaction that crashed
+            os.remove(temporary_path)
+        self._create(temporary_path, self.keys_field.spec, self.values_field.spec, capacity)
+        new_map = DiskHashMap(temporary_path, max_load_factor = self.max_load_factor)
+        for index in range(self.capacity): # copy the raw slots, the stored hash means no key is hashed again
+            offset = self._offset(index)
+            used, key_hash = SLOT_HEADER.unpack_from(self.map, offset)
+            if used:
+                new_map._insert(key_hash, self.map[offset + SLOT_HEADER.size:offset + self.slot_size])
+        new_map._set_count(self.count)
+        new_map.flush()
+        os.fsync(new_map.file.fileno())
+        new_map.close()
+        self.close()
+        os.replace(temporary_path, self.path) # the atomic swap
+        _fsync_directory(self.path)
+        self._open()
+
+    # O(m)
+    def close(self):
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.file.close()
+            self.map = None
+
+    # helper methods
+
+    def _create(self, path, key_format, value_format, capacity): # writes an empty map, the slots are zero bytes which means unused
+        keys_field, values_field = _Field(key_format), _Field(value_format)
+        _check_format_length(keys_field, values_field)
+        slot_size = SLOT_HEADER.size + keys_field.size + values_field.size
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, keys_field.spec.encode(), values_field.spec.encode(), capacity, 0).ljust(HEADER_SIZE, b"\0"))
+            file.truncate(HEADER_SIZE + capacity * slot_size) # a sparse file, the OS doesnt write the zero pages
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _open(self):
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, key_spec, value_spec, self.capacity, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a DiskHashMap file")
+        self.keys_field = _Field(key_spec.rstrip(b"\0").decode())
+        self.values_field = _Field(value_spec.rstrip(b"\0").decode())
+        self.value_offset = SLOT_HEADER.size + self.keys_field.size # where the value starts inside a slot
+        self.slot_size = self.value_offset + self.values_field.size
+
+    # O(1)
+    def _offset(self, index): # where a slot starts in the file
+        return HEADER_SIZE + index * self.slot_size
+
+    # O(1)
+    def _set_count(self, count):
+        self.count = count
+        struct.pack_into("<Q", self.map, HEADER.size - 8, count)
+
+    # Average: O(1)
+    def _find(self, packed_key): # returns the slot of the key (or -1) and the hash of the key
+        key_hash = _hash(packed_key)
+        mask = self.capacity - 1
+        index = key_hash & mask
+        key_start = SLOT_HEADER.size
+        key_end = self.value_offset
+        while True:
+            offset = self._offset(index)
+            used, slot_hash = SLOT_HEADER.unpack_from(self.map, offset)
+            if not used:
+                return -1, key_hash
+            if slot_hash == key_hash and self.map[offset + key_start:offset + key_end] == packed_key:
+                return index, key_hash
+            index = (index + 1) & mask
+
+    # Average: O(1)
+    def _insert(self, key_hash, payload): # writes the packed key and value into the first free slot from the home slot
+        mask = self.capacity - 1
+        index = key_hash & mask
+        while self.map[self._offset(index)]:
+            index = (index + 1) & mask
+        offset = self._offset(index)
+        SLOT_HEADER.pack_into(self.map, offset, 1, key_hash)
+        self.map[offset + SLOT_HEADER.size:offset + self.slot_size] = payload
+
+
+def _check_format_length(*fields):
+    for field in fields:
+        if len(field.spec.encode()) > FORMAT_SIZE:
+            raise ValueError(f"Format {field.spec!r} is longer than {FORMAT_SIZE} bytes")
+
+
+def _hash(data): # stable across processes and runs, unlike hash()
+    return int.from_bytes(hashlib.blake2b(data, digest_size = 8).digest(), "little")
+
+
+def _power_of_two(n):
+    size = 1
+    while size < n:
+        size *= 2
+    return size
+
+
+def _fsync_directory(path): # makes the rename itself durable
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "ids.map")
+
+    with DiskHashMap(path, key_format = 32, value_format = 'q', capacity = 8) as disk_map:
+        for i in range(100):
+            disk_map.put(f"user{i}".encode(), i * 10)
+        disk_map.remove(b"user5")
+        print(len(disk_map))
+
+    with DiskHashMap(path) as disk_map: # reopening reads nothing up front
+        print(disk_map.get(b"user42"))
+        print(b"user5" in disk_map)
+        disk_map.compact()
+        print(disk_map.capacity)
+        print(sorted(disk_map.values())[:5])
+
+    os.remove(path)
@@ -0,0 +1,393 @@
+# A B+ tree - the ordered map of 6_binary_search_tree.py, but built for a file instead of for memory
+# a binary search tree has one key per node, so a lookup in a million keys touches about 20 nodes, and on disk every one of them can be a read
+# a B+ tree packs hundreds of keys into one page (a fixed size block of the file), so the same lookup touches 3 or 4 pages
+
+# There are two kinds of pages:
+# internal pages hold keys and the page numbers of their children, the keys only guide the search
+# leaf pages hold the keys with their values, and every leaf knows the next leaf, so a range scan walks the leaves from left to right
+# every page (except the root) is kept at least half full: a page that overflows is split in two, a page that gets too empty
+# borrows a key from a sibling, or is merged with it when the sibling has none to spare. All the leaves stay at the same depth
+
+# Like 13_disk_hashmap.py the file is memory mapped and keys and values have a fixed width
+# (a struct format like 'q' or 'd', or an int n for bytes of up to n bytes), and opening a tree of any size reads nothing up front
+# [ header page | page 1 | page 2 | ... ]
+# every page is [ kind (1 byte) | count (2 bytes) | next (8 bytes) | keys | values or children ]
+# next is the next leaf of a leaf, or the next free page of a freed page (deleted pages are reused before the file grows)
+
+# Buffer pool - decoding a page into python lists is the slow part, so the hot pages (the root and the levels under it) are kept decoded
+# in an LRUCache (10_cache.py). Changes are written through to the mapped file right away, so an evicted page never has to be written back
+# Writes to the mapped pages are not crash safe on their own, call flush() to push them to disk
+
+import importlib
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_left, bisect_right
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__))) # the modules start with a digit, so we load them with importlib
+LRUCache = importlib.import_module("10_cache").LRUCache
+_Field = importlib.import_module("13_disk_hashmap")._Field
+_check_format_length = importlib.import_module("13_disk_hashmap")._check_format_length
+
+MAGIC = b"DSABTRE1"
+HEADER = struct.Struct("<8s16s16sQQQQQQQ") # magic, key format, value format, page size, root, first leaf, pages, free page, count, height
+PAGE_HEADER = struct.Struct("<BHQ") # kind, count, next
+CHILD = struct.Struct("<Q")
+FREE, LEAF, INTERNAL = 0, 1, 2
+
+
+class Page: # a decoded page, leaves use values and internal pages use children
+    def __init__(self, number, kind, keys, items, next_page = 0):
+        self.number = number
+        self.kind = kind
+        self.keys = keys
+        self.items = items # the values of a leaf, or the len(keys) + 1 child page numbers of an internal page
+        self.next = next_page
+
+    def __repr__(self):
+        return f"Page({self.number}, {self.keys})"
+
+
+class BPlusTree:
+    def __init__(self, path, key_format = None, value_format = None, page_size = 4096, cache_pages = 64):
+        # if the file exists we open it (the formats and page size are read from the file), else we create it
+        self.path = path
+        if not os.path.exists(path):
+            if key_format is None or value_format is None:
+                raise ValueError("key_format and value_format are required to create a tree")
+            self._create(path, key_format, value_format, page_size)
+        self.cache = LRUCache(max_items = cache_pages) # page number -> Page
+        self._open()
+
+    # O(1)
+    def __len__(self):
+        return self.count
+
+    # O(log n)
+    def __contains__(self, key):
+        return self.search(key) is not None
+
+    # O(n) - walks the linked leaves
+    def __iter__(self):
+        yield from self._scan(self._page(self.first_leaf), 0, None)
+
+    # O(n)
+    def __repr__(self):
+        return str(list(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # O(log n) - plus O(b) to shift the keys inside the page, b is the number of keys per page
+    def insert(self, key, value):
+        self.keys_field.pack(key) # fails before anything is changed if the key or value doesnt fit
+        self.values_field.pack(value)
+        path, leaf = self._descend(key)
+        index = bisect_left(leaf.keys, key)
+        if index < len(leaf.keys) and leaf.keys[index] == key: # the key is present, so we update the value
+            leaf.items[index] = value
+            self._write(leaf)
+            return
+        leaf.keys.insert(index, key)
+        leaf.items.insert(index, value)
+        self._set_header(count = self.count + 1)
+        page = leaf
+        while len(page.keys) > self._capacity(page.kind): # the page overflows, so we split it and add the new page to the parent
+            separator, new_page = self._split(page)
+            if not path: # we split the root, so the tree grows a level
+                root = self._allocate(INTERNAL, [separator], [page.number, new_page.number])
+                self._set_header(root = root.number, height = self.height() + 1)
+                return
+            parent, index = path.pop()
+            parent.keys.insert(index, separator)
+            parent.items.insert(index + 1, new_page.number)
+            page = parent
+        self._write(page)
+
+    # O(log n)
+    def search(self, key): # returns the value of the key, or None if it isnt present
+        leaf = self._descend(key)[1]
+        index = bisect_left(leaf.keys, key)
+        if index < len(leaf.keys) and leaf.keys[index] == key:
+            return leaf.items[index]
+        return None
+
+    # O(log n) - plus O(b) to shift the keys inside the pages
+    def delete(self, key):
+        path, leaf = self._descend(key)
+        index = bisect_left(leaf.keys, key)
+        if index == len(leaf.keys) or leaf.keys[index] != key:
+            raise KeyError('Key doesnt exist')
+        del leaf.keys[index]
+        del leaf.items[index]
+        self._set_header(count = self.count - 1)
+        page = leaf
+        while path and len(page.keys) < self._capacity(page.kind) // 2: # the page is less than half full
+            parent, index = path.pop()
+            self._rebalance(parent, index, page)
+            page = parent
+        if not path and page.kind == INTERNAL and not page.keys: # the root has a single child left, so the tree loses a level
+            self._set_header(root = page.items[0], height = self.height() - 1)
+            self._free(page)
+            return
+        self._write(page)
+
+    def traverse(self, order = 'inorder'): # the values live only in the leaves, so in order (by key) is the only order there is
+        if order != 'inorder':
+            raise ValueError('Unknown order')
+        yield from self
+
+    # O(log n + k) - k is the number of keys returned
+    def range(self, lo, hi): # yields the (key, value) of the keys in [lo, hi) in order
+        leaf = self._descend(lo)[1]
+        yield from self._scan(leaf, bisect_left(leaf.keys, lo), hi)
+
+    # O(1)
+    def height(self): # number of pages on the path from the root down to a leaf
+        return self.stored_height
+
+    # O(m) - writes the dirty pages to disk
+    def flush(self):
+        self.map.flush()
+
+    # O(m)
+    def close(self):
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.file.close()
+            self.map = None
+
+    # helper methods
+
+    def _create(self, path, key_format, value_format, page_size): # writes the header and an empty root leaf
+        keys_field, values_field = _Field(key_format), _Field(value_format)
+        _check_format_length(keys_field, values_field) # the header stores each format in 16 bytes, like 13_disk_hashmap.py
+        if page_size < HEADER.size or min(_leaf_capacity(page_size, keys_field, values_field), _internal_capacity(page_size, keys_field)) < 3:
+            raise ValueError("Page size is too small for the key and value formats")
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, keys_field.spec.encode(), values_field.spec.encode(), page_size, 1, 1, 2, 0, 0, 1).ljust(page_size, b"\0"))
+            file.write(PAGE_HEADER.pack(LEAF, 0, 0).ljust(page_size, b"\0"))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _open(self):
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, key_spec, value_spec, self.page_size, self.root, self.first_leaf, self.pages, self.free_page, self.count, self.stored_height = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a BPlusTree file")
+        self.keys_field = _Field(key_spec.rstrip(b"\0").decode())
+        self.values_field = _Field(value_spec.rstrip(b"\0").decode())
+        self.leaf_capacity = _leaf_capacity(self.page_size, self.keys_field, self.values_field)
+        self.internal_capacity = _internal_capacity(self.page_size, self.keys_field)
+
+    # O(1)
+    def _set_header(self, **fields): # updates the root, count, height, ... both here and in the file
+        for name, value in fields.items():
+            setattr(self, "stored_height" if name == "height" else name, value)
+        HEADER.pack_into(self.map, 0, MAGIC, self.keys_field.spec.encode(), self.values_field.spec.encode(), self.page_size,
+                         self.root, self.first_leaf, self.pages, self.free_page, self.count, self.stored_height)
+
+    # O(1)
+    def _capacity(self, kind): # max number of keys a page of this kind can hold
+        return self.leaf_capacity if kind == LEAF else self.internal_capacity
+
+    # O(log n)
+    def _descend(self, key): # returns the leaf where key belongs, and the path to it as (internal page, index of the child we took)
+        path = []
+        page = self._page(self.root)
+        while page.kind == INTERNAL:
+            index = bisect_right(page.keys, key) # keys equal to a separator are in the right child
+            path.append((page, index))
+            page = self._page(page.items[index])
+        return path, page
+
+    # O(k) - plus one page read for every leaf
+    def _scan(self, leaf, index, hi): # yields the entries from position index of leaf onwards, following the next links, until hi
+        while True:
+            for position in range(index, len(leaf.keys)):
+                if hi is not None and not leaf.keys[position] < hi:
+                    return
+                yield (leaf.keys[position], leaf.items[position])
+            if not leaf.next:
+                return
+            leaf, index = self._page(leaf.next), 0
+
+    # O(b)
+    def _split(self, page): # moves the upper half of page to a new page, returns the separator key for the parent and the new page
+        middle = len(page.keys) // 2
+        if page.kind == LEAF: # the first key of the new leaf is copied up, the leaf keeps it
+            separator = page.keys[middle]
+            new_page = self._allocate(LEAF, page.keys[middle:], page.items[middle:], page.next)
+            page.next = new_page.number
+            del page.keys[middle:], page.items[middle:]
+        else: # the middle key moves up, it isnt needed in either half
+            separator = page.keys[middle]
+            new_page = self._allocate(INTERNAL, page.keys[middle + 1:], page.items[middle + 1:])
+            del page.keys[middle:], page.items[middle + 1:]
+        self._write(page)
+        return separator, new_page
+
+    # O(b)
+    def _rebalance(self, parent, index, page): # page is the child at index of parent and is too empty, so it borrows from or merges with a sibling
+        left = self._page(parent.items[index - 1]) if index > 0 else None
+        right = self._page(parent.items[index + 1]) if index + 1 < len(parent.items) else None
+        minimum = self._capacity(page.kind) // 2
+        if left is not None and len(left.keys) > minimum: # borrow the last key of the left sibling
+            if page.kind == LEAF:
+                page.keys.insert(0, left.keys.pop())
+                page.items.insert(0, left.items.pop())
+                parent.keys[index - 1] = page.keys[0]
+            else: # the separator comes down and the last key of the sibling goes up in its place
+                page.keys.insert(0, parent.keys[index - 1])
+                page.items.insert(0, left.items.pop())
+                parent.keys[index - 1] = left.keys.pop()
+            self._write(left)
+            self._write(page)
+        elif right is not None and len(right.keys) > minimum: # borrow the first key of the right sibling
+            if page.kind == LEAF:
+                page.keys.append(right.keys.pop(0))
+                page.items.append(right.items.pop(0))
+                parent.keys[index] = right.keys[0]
+            else:
+                page.keys.append(parent.keys[index])
+                page.items.append(right.items.pop(0))
+                parent.keys[index] = right.keys.pop(0)
+            self._write(right)
+            self._write(page)
+        else: # neither sibling can spare a key, so we merge with one of them, the merged page is at most full
+            if left is not None:
+                self._merge(parent, index - 1, left, page)
+            else:
+                self._merge(parent, index, page, right)
+
+    # O(b)
+    def _merge(self, parent, index, left, right): # moves everything of right into left, they are the children at index and index + 1
+        if left.kind == INTERNAL: # the separator between them comes down
+            left.keys.append(parent.keys[index])
+        else:
+            left.next = right.next
+        left.keys.extend(right.keys)
+        left.items.extend(right.items)
+        del parent.keys[index], parent.items[index + 1]
+        self._write(left)
+        self._free(right)
+
+    # O(b) - the page is decoded once and then served from the cache while it stays hot
+    def _page(self, number):
+        page = self.cache.get(number)
+        if page is not None:
+            return page
+        offset = number * self.page_size
+        kind, count, next_page = PAGE_HEADER.unpack_from(self.map, offset)
+        offset += PAGE_HEADER.size
+        key_size = self.keys_field.size
+        keys = _unpack_many(self.keys_field, self.map, offset, count)
+        offset += self._capacity(kind) * key_size
+        if kind == LEAF:
+            items = _unpack_many(self.values_field, self.map, offset, count)
+        else:
+            items = list(struct.unpack_from(f"<{count + 1}Q", self.map, offset))
+        page = Page(number, kind, keys, items, next_page)
+        self.cache.put(number, page)
+        return page
+
+    # O(b)
+    def _write(self, page): # encodes the page into the mapped file
+        offset = page.number * self.page_size
+        PAGE_HEADER.pack_into(self.map, offset, page.kind, len(page.keys), page.next)
+        offset += PAGE_HEADER.size
+        key_size = self.keys_field.size
+        self.map[offset:offset + len(page.keys) * key_size] = _pack_many(self.keys_field, page.keys)
+        offset += self._capacity(page.kind) * key_size
+        if page.kind == LEAF:
+            self.map[offset:offset + len(page.items) * self.values_field.size] = _pack_many(self.values_field, page.items)
+        else:
+            struct.pack_into(f"<{len(page.items)}Q", self.map, offset, *page.items)
+        self.cache.put(page.number, page)
+
+    # O(1) - amortized, because the file grows by doubling
+    def _allocate(self, kind, keys, items, next_page = 0): # creates a page, reusing a freed one if there is one
+        if self.free_page:
+            number = self.free_page
+            self._set_header(free_page = PAGE_HEADER.unpack_from(self.map, number * self.page_size)[2])
+        else:
+            number = self.pages
+            if (number + 1) * self.page_size > len(self.map):
+                self._grow(2 * len(self.map))
+            self._set_header(pages = number + 1)
+        page = Page(number, kind, keys, items, next_page)
+        self._write(page)
+        return page
+
+    # O(1)
+    def _free(self, page): # puts the page on the free list
+        if page.number in self.cache:
+            self.cache.remove(page.number)
+        PAGE_HEADER.pack_into(self.map, page.number * self.page_size, FREE, 0, self.free_page)
+        self._set_header(free_page = page.number)
+
+    # O(m)
+    def _grow(self, size): # makes the file bigger and maps it again, the new pages are sparse
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+
+# O(b) - a struct format packs the whole page of keys or values in one call, which is much faster than one call per key
+def _pack_many(field, values):
+    if field.max_length is None:
+        return struct.pack("<" + field.spec * len(values), *values)
+    return b"".join(map(field.pack, values))
+
+
+# O(b)
+def _unpack_many(field, buffer, offset, count):
+    if field.max_length is None:
+        return list(struct.unpack_from("<" + field.spec * count, buffer, offset))
+    return [field.unpack_from(buffer, offset + i * field.size) for i in range(count)]
+
+
+def _leaf_capacity(page_size, keys_field, values_field):
+    return (page_size - PAGE_HEADER.size) // (keys_field.size + values_field.size)
+
+
+def _internal_capacity(page_size, keys_field): # n keys need n + 1 children
+    return (page_size - PAGE_HEADER.size - CHILD.size) // (keys_field.size + CHILD.size)
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "prices.tree")
+
+    with BPlusTree(path, key_format = 'q', value_format = 'd', page_size = 4096) as tree:
+        keys = list(range(20_000))
+        random.shuffle(keys)
+        for key in keys:
+            tree.insert(key, key / 100)
+        for key in range(0, 20_000, 2):
+            tree.delete(key)
+        print(len(tree), tree.height(), tree.pages)
+
+    with BPlusTree(path, cache_pages = 16) as tree: # reopening reads nothing up front
+        print(tree.search(4243), tree.search(4242))
+        print(list(tree.range(1000, 1010)))
+        for key in random.sample(range(20_000), 1000):
+            tree.search(key)
+        print(tree.cache.stats()["hit_rate"]) # the root and the pages under it are almost always cached
+
+    with BPlusTree(path + ".names", key_format = 16, value_format = 'q', page_size = 256) as names:
+        for i, name in enumerate([b"carol", b"alice", b"eve", b"bob", b"dave"]):
+            names.insert(name, i)
+        print(names)
+
+    os.remove(path)
+    os.remove(path + ".names")
@@ -1,28 +1,34 @@
+import random
+from itertools import islice
+
+
 class Node:
     def __init__(self, value):
         self.value = value
         self.next = None
 
 class LinkedList:
+    repr_limit = 100 # max number of values shown by repr, set it to None to show them all
+
     def __init__(self):
         self.head = None
+        self.tail = None # reference to the last node so that append doesnt have to walk the whole LL
+        self.size = 0 # keeping track of the number of nodes so that len doesnt have to count them
 
-    # O(n) - linear runtime
+    # O(k) - where k is the repr_limit, the rest of the LL is never visited
     def __repr__(self):
         # there the LL is empty then return an empty list
-        # if there are elements then first set the last to point the head
-        # now until the last's next is not 0 we iterate bu moving the last reference to its next node
-        # concat all the nodes's values to dusplay
-        if self.head is None:
-            return "[]"
-        else:
-            last = self.head
-            return_str = f"[ {last.value}"
-            while last.next:
-                last = last.next
-                return_str += f" -> {last.value}"
-            return_str += " ]"
-            return return_str
+        # else we join the first repr_limit values in one go instead of growing a string with += (which copies it every time)
+        # if there are more values than the limit we end with "..." so that printing a huge LL stays cheap
+        return _join_values(self, " -> ", self.repr_limit)
+
+    # O(n) - linear runtime
+    def __iter__(self):
+        # yields the values one by one, from the head to the tail, without copying them into a list
+        last = self.head
+        while last is not None:
+            yield last.value
+            last = last.next
 
     # O(n) - linear runtime
     def __contains__(self, value):
@@ -35,27 +41,45 @@ class LinkedList:
             curr = curr.next
         return False
 
-    # O(n) - linear time
+    # O(1) - constant time
     def __len__(self):
-        # iterate through the LL by adding 1 to the counter at each step
-        last = self.head
-        counter = 0
-        while last is not None:
-            counter += 1
-            last = last.next
-        return counter
+        # the size is updated by every method that adds or removes a node, so we dont need to count them
+        return self.size
     
-    # O(n) - linear time
+    # O(1) - constant time
     def append(self, value):
-        # if head is none, that means there are no nodes in the LL, so we need to create a node and set the head to the new node.
-        # if there are nodes, then i need to find the node that doesnt have a next node and create a new node and point that node to the new node.
+        # if head is none, that means there are no nodes in the LL, so we need to create a node and set both the head and the tail to the new node.
+        # if there are nodes, then the tail is already the node that doesnt have a next node, so we point its next to the new node and move the tail to the new node.
+        new_node = Node(value)
         if self.head is None:
-            self.head = Node(value)
+            self.head = self.tail = new_node
         else:
-            last = self.head
-            while last.next:
-                last = last.next
-            last.next = Node(value)
+            self.tail.next = new_node
+            self.tail = new_node
+        self.size += 1
+
+    # O(k) - linear in the number of values added
+    def extend(self, values):
+        # we link all the new nodes into a separate chain first and only attach it to the tail once
+        # this way each value costs one node creation and one pointer change, no matter how long the LL already is
+        first = last = None
+        count = 0
+        for value in values:
+            new_node = Node(value)
+            if first is None:
+                first = last = new_node
+            else:
+                last.next = new_node
+                last = new_node
+            count += 1
+        if first is None: # nothing to add
+            return
+        if self.head is None:
+            self.head = first
+        else:
+            self.tail.next = first
+        self.tail = last
+        self.size += count
 
     # O(1) - constant time
     def prepend(self, value):
@@ -63,6 +87,9 @@ class LinkedList:
         first_node = Node(value)
         first_node.next = self.head
         self.head = first_node
+        if self.tail is None: # the LL was empty so the new node is also the last node
+            self.tail = first_node
+        self.size += 1
 
     # O(n) - linear time
     def insert(self, value, index):
@@ -85,6 +112,9 @@ class LinkedList:
                 new_node = Node(value)
                 new_node.next = last.next
                 last.next = new_node
+                if new_node.next is None: # we inserted after the last node, so the new node is the tail now
+                    self.tail = new_node
+                self.size += 1
 
     # O(n) - linear time            
     def delete(self, value):
@@ -95,10 +125,16 @@ class LinkedList:
         if last is not None:
             if last.value == value:
                 self.head = last.next
+                if self.head is None: # we deleted the only node
+                    self.tail = None
+                self.size -= 1
             else:
                 while last.next:
                     if last.next.value == value:
+                        if last.next is self.tail: # we are deleting the last node, so the previous node becomes the tail
+                            self.tail = last
                         last.next = last.next.next
+                        self.size -= 1
                         break
                     last = last.next
 
@@ -108,6 +144,11 @@ class LinkedList:
         # if the given index is after the last element of the LL (which is None), we raise a value error
         if self.head is None:
             raise ValueError("Index out of bounds")
+        elif index == 0: # removing the head, there is no previous node to re-point
+            self.head = self.head.next
+            if self.head is None:
+                self.tail = None
+            self.size -= 1
         else:
             last = self.head
             for i in range(index - 1):
@@ -117,7 +158,15 @@ class LinkedList:
             if last.next is None:
                 raise ValueError("Index out of bounds")
             else:
+                if last.next is self.tail: # we are removing the last node, so the previous node becomes the tail
+                    self.tail = last
                 last.next = last.next.next
+                self.size -= 1
+
+    # O(stop) - lazy, nothing is copied
+    def slice(self, start, stop = None, step = 1):
+        # works like itertools.islice, the values are yielded while the LL is being walked
+        return islice(self, start, stop, step)
 
     # O(n) - Linear time 
     def get(self, index):
@@ -132,8 +181,326 @@ class LinkedList:
                 last = last.next
             return last.value
 
+
+# Unrolled linked list - each node holds a small block (a python list) of values instead of a single value
+# this means far fewer node objects and pointers to chase, so scans like __contains__, get and __repr__ touch much less memory
+# when a block gets full we split it into two half full blocks
+# when a block gets less than half full after a removal we either borrow from or merge with the next block
+class UnrolledNode:
+    def __init__(self):
+        self.values = [] # the block of values held by this node, at most capacity of them
+        self.next = None
+
+class UnrolledLinkedList:
+    repr_limit = 100 # max number of values shown by repr, set it to None to show them all
+
+    def __init__(self, capacity = 64):
+        if capacity < 2:
+            raise ValueError("Capacity must be at least 2")
+        self.capacity = capacity # max number of values per node
+        self.head = None
+        self.tail = None
+        self.size = 0
+
+    # O(k) - where k is the repr_limit
+    def __repr__(self):
+        return _join_values(self, " -> ", self.repr_limit)
+
+    # O(n) - linear runtime
+    def __iter__(self):
+        node = self.head
+        while node is not None:
+            yield from node.values
+            node = node.next
+
+    # O(n) - linear runtime, but the values inside a block are compared by the list itself
+    def __contains__(self, value):
+        node = self.head
+        while node is not None:
+            if value in node.values:
+                return True
+            node = node.next
+        return False
+
+    # O(1) - constant time
+    def __len__(self):
+        return self.size
+
+    # O(1) - constant time
+    def append(self, value):
+        # we only create a new node when the tail block is full
+        if self.tail is None or len(self.tail.values) == self.capacity:
+            new_node = UnrolledNode()
+            if self.tail is None:
+                self.head = self.tail = new_node
+            else:
+                self.tail.next = new_node
+                self.tail = new_node
+        self.tail.values.append(value)
+        self.size += 1
+
+    # O(k) - linear in the number of values added
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    # O(b) - where b is the capacity of a block
+    def prepend(self, value):
+        self.insert(value, 0)
+
+    # O(n / b + b)
+    def insert(self, value, index):
+        # insert at the end is an append, anything else goes into the block that holds the index
+        if index < 0 or index > self.size:
+            raise ValueError("Index out of bounds")
+        if index == self.size:
+            self.append(value)
+            return
+        node, offset = self._find(index)
+        if len(node.values) == self.capacity: # the block is full so we split it first
+            self._split(node)
+            if offset > len(node.values): # the index now lives in the second half
+                offset -= len(node.values)
+                node = node.next
+        node.values.insert(offset, value)
+        self.size += 1
+
+    # O(n) - linear time
+    def delete(self, value):
+        # remove the first occurrence of the value, do nothing if it isnt present
+        previous = None
+        node = self.head
+        while node is not None:
+            if value in node.values:
+                node.values.remove(value)
+                self.size -= 1
+                self._rebalance(previous, node)
+                return
+            previous = node
+            node = node.next
+
+    # O(n / b + b)
+    def pop(self, index):
+        if index < 0 or index >= self.size:
+            raise ValueError("Index out of bounds")
+        previous = None
+        node = self.head
+        while index >= len(node.values):
+            index -= len(node.values)
+            previous = node
+            node = node.next
+        value = node.values.pop(index)
+        self.size -= 1
+        self._rebalance(previous, node)
+        return value
+
+    # O(n / b) - we skip whole blocks at a time
+    def get(self, index):
+        if index < 0 or index >= self.size:
+            raise ValueError("Index out of bounds")
+        node, offset = self._find(index)
+        return node.values[offset]
+
+    # helper methods
+
+    # O(n / b)
+    def _find(self, index): # returns the node holding the index and the offset of the index inside that node
+        node = self.head
+        while index >= len(node.values):
+            index -= len(node.values)
+            node = node.next
+        return node, index
+
+    # O(b)
+    def _split(self, node): # move the second half of a full node into a new node right after it
+        new_node = UnrolledNode()
+        half = len(node.values) // 2
+        new_node.values = node.values[half:]
+        del node.values[half:]
+        new_node.next = node.next
+        node.next = new_node
+        if self.tail is node:
+            self.tail = new_node
+
+    # O(b)
+    def _rebalance(self, previous, node): # called after a removal from node, keeps every block at least half full
+        if node.values:
+            if len(node.values) >= self.capacity // 2 or node.next is None:
+                return
+            next_node = node.next
+            if len(node.values) + len(next_node.values) <= self.capacity: # both fit into one block, so we merge them
+                node.values.extend(next_node.values)
+                node.next = next_node.next
+                if self.tail is next_node:
+                    self.tail = node
+            else: # the next block is too full to merge, so we borrow values from it instead
+                borrow = (len(next_node.values) - len(node.values)) // 2
+                node.values.extend(next_node.values[:borrow])
+                del next_node.values[:borrow]
+        else: # the block is empty so we unlink it
+            if previous is None:
+                self.head = node.next
+            else:
+                previous.next = node.next
+            if self.tail is node:
+                self.tail = previous
+
+
+# Skip list - a sorted LL with extra "express lanes" on top of the normal chain of nodes
+# level 0 is the normal LL (node.next), every level above skips over more and more nodes
+# each node gets a random number of levels (coin flips), so on average level i holds n / 2^i nodes
+# to search we start at the top level and move right while the next value is still smaller, then drop down a level
+# each link also stores its span (how many level 0 nodes it jumps over), so we can also find the node at an index in O(log n)
+class SkipNode(Node):
+    def __init__(self, value, level):
+        super().__init__(value)
+        self.forward = [None] * level # forward[i] is the next node on level i, forward[0] is the same as next
+        self.span = [0] * level # span[i] is how many positions forward[i] is ahead of this node
+
+class SortedLinkedList:
+    MAX_LEVEL = 32 # enough levels for 2^32 values
+    P = 0.5 # the chance that a node is promoted to the next level
+    repr_limit = 100 # max number of values shown by repr, set it to None to show them all
+
+    def __init__(self, values = ()):
+        self.head = SkipNode(None, self.MAX_LEVEL) # sentinel node before the first value, it has every level
+        self.level = 1 # number of levels currently in use
+        self.size = 0
+        self.head.span = [1] * self.MAX_LEVEL
+        for value in values:
+            self.insert(value)
+
+    # O(k) - where k is the repr_limit
+    def __repr__(self):
+        return _join_values(self, " -> ", self.repr_limit)
+
+    # O(log n) - expected
+    def __contains__(self, value):
+        node = self._find_previous(value)[0][0].forward[0]
+        return node is not None and node.value == value
+
+    # O(1) - constant time
+    def __len__(self):
+        return self.size
+
+    # O(n) - in sorted order, walking level 0
+    def __iter__(self):
+        node = self.head.next
+        while node is not None:
+            yield node.value
+            node = node.next
+
+    # O(log n) - expected
+    def insert(self, value):
+        # find the last node before the value on every level, link the new node after them and fix the spans
+        update, rank = self._find_previous(value)
+        level = self._random_level()
+        if level > self.level: # the new levels start at the head and span to the end of the list
+            for i in range(self.level, level):
+                update[i] = self.head
+                rank[i] = 0
+                self.head.span[i] = self.size + 1
+            self.level = level
+        new_node = SkipNode(value, level)
+        for i in range(level):
+            new_node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = new_node
+            new_node.span[i] = update[i].span[i] - (rank[0] - rank[i]) # the part of the old span that is now after the new node
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self.level): # the links that jump over the new node are one longer now
+            update[i].span[i] += 1
+        new_node.next = new_node.forward[0]
+        update[0].next = new_node
+        self.size += 1
+
+    # O(log n) - expected
+    def delete(self, value):
+        # remove the first occurrence of the value, do nothing if it isnt present
+        update = self._find_previous(value)[0]
+        node = update[0].forward[0]
+        if node is None or node.value != value:
+            return
+        for i in range(self.level):
+            if update[i].forward[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].forward[i] = node.forward[i]
+            else:
+                update[i].span[i] -= 1
+        update[0].next = node.next
+        while self.level > 1 and self.head.forward[self.level - 1] is None: # drop the levels that are empty now
+            self.level -= 1
+        self.size -= 1
+
+    # O(log n) - expected
+    def get(self, index):
+        if index < 0 or index >= self.size:
+            raise ValueError("Index out of bounds")
+        target = index + 1 # the head sentinel is position 0
+        node = self.head
+        position = 0
+        for i in reversed(range(self.level)):
+            while node.forward[i] is not None and position + node.span[i] <= target:
+                position += node.span[i]
+                node = node.forward[i]
+            if position == target:
+                return node.value
+
+    # helper methods
+
+    # O(log n) - expected
+    def _find_previous(self, value): # returns the last node before the value on each level and its position
+        update = [None] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self.head
+        position = 0
+        for i in reversed(range(self.level)):
+            while node.forward[i] is not None and node.forward[i].value < value:
+                position += node.span[i]
+                node = node.forward[i]
+            update[i] = node
+            rank[i] = position
+        return update, rank
+
+    # O(log n) - expected
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self.P:
+            level += 1
+        return level
+
+
+# O(k) - where k is the limit
+def _join_values(values, separator, limit): # used by the reprs, joins at most limit values and marks the rest with "..."
+    shown = [str(value) for value in islice(values, None if limit is None else limit + 1)] # one extra to know if there are more
+    if not shown:
+        return "[]"
+    if limit is not None and len(shown) > limit:
+        shown[limit:] = ["..."]
+    return "[ " + separator.join(shown) + " ]"
+
+
+def benchmark(n = 1_000_000):
+    # compares memory per element and scan throughput of LinkedList and UnrolledLinkedList
+    import time
+    import tracemalloc
+
+    for cls in (LinkedList, UnrolledLinkedList):
+        tracemalloc.start()
+        ll = cls()
+        ll.extend(range(n))
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        -1 in ll # a miss scans every value
+        scan_time = time.perf_counter() - start
+
+        print(f"{cls.__name__:>20}: {memory / n:6.1f} bytes/element, {n / scan_time / 1e6:8.2f} M values scanned/s")
+
     
 if __name__ == "__main__":
+    import sys
+
     ll = LinkedList()
 
     ll.append(10)
@@ -142,6 +509,7 @@ if __name__ == "__main__":
     ll.append(22)
     ll.append(29)
     ll.prepend(100)
+    ll.extend([1, 2, 3])
 
     ll.insert(200, 1)
 
@@ -154,5 +522,26 @@ if __name__ == "__main__":
     print(800 in ll)
     print(29 in ll)
     print(ll)
+    print(len(ll))
+    print(list(ll.slice(1, 6, 2)))
+
+    ull = UnrolledLinkedList(capacity = 4)
+    ull.extend(range(10))
+    ull.insert(100, 3)
+    ull.pop(0)
+    ull.delete(7)
+    print(ull.get(2))
+    print(ull)
+    print(len(ull))
+
+    sll = SortedLinkedList([30, 10, 20, 50, 40])
+    sll.insert(25)
+    sll.delete(50)
+    print(sll.get(2))
+    print(25 in sll)
+    print(sll)
+
+    if "--bench" in sys.argv:
+        benchmark()
 
 
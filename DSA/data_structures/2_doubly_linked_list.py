@@ -1,31 +1,49 @@
+from itertools import islice
+
+
 class Node:
     def __init__(self, value):
         self.value = value
         self.next = None
         self.previous = None
+        self.owner = None # the LL the node is in, so a handle from another LL (or a removed one) is rejected
 
 class DoublyLinkedList:
+    repr_limit = 100 # max number of values shown by repr, set it to None to show them all
+
     def __init__(self):
         self.head = None
         self.tail = None
+        self.size = 0 # keeping track of the number of nodes, so that len is O(1) and we know which end is closer to an index
 
-    # O(n) - linear runtime
+    # O(k) - where k is the repr_limit, the rest of the LL is never visited
     # This is same as singly linked list
     def __repr__(self):
         # there the LL is empty then return an empty list
-        # if there are elements then first set the last to point the head
-        # now until the last's next is not 0 we iterate bu moving the last reference to its next node
-        # concat all the nodes's values to dusplay
-        if self.head is None:
+        # else we join the first repr_limit values in one go instead of growing a string with += (which copies it every time)
+        # if there are more values than the limit we end with "..." so that printing a huge LL stays cheap
+        shown = [str(value) for value in islice(self, None if self.repr_limit is None else self.repr_limit + 1)] # one extra to know if there are more
+        if not shown:
             return "[]"
-        else:
-            last = self.head
-            return_str = f"[ {last.value}"
-            while last.next:
-                last = last.next
-                return_str += f" <-> {last.value}"
-            return_str += " ]"
-            return return_str
+        if self.repr_limit is not None and len(shown) > self.repr_limit:
+            shown[self.repr_limit:] = ["..."]
+        return "[ " + " <-> ".join(shown) + " ]"
+
+    # O(n) - linear runtime
+    def __iter__(self):
+        # yields the values from the head to the tail without copying them into a list
+        last = self.head
+        while last is not None:
+            yield last.value
+            last = last.next
+
+    # O(n) - linear runtime
+    def __reversed__(self):
+        # same as __iter__ but we start at the tail and follow the previous links
+        last = self.tail
+        while last is not None:
+            yield last.value
+            last = last.previous
 
     # O(n) - linear runtime
     # This is same as singly linked list
@@ -39,125 +57,209 @@ class DoublyLinkedList:
             curr = curr.next
         return False
 
-    # O(n) - linear time
-    # This is same as singly linked list
+    # O(1) - constant time
     def __len__(self):
-        # iterate through the LL by adding 1 to the counter at each step
-        last = self.head
-        counter = 0
-        while last is not None:
-            counter += 1
-            last = last.next
-        return counter
+        # the size is updated by every method that adds or removes a node, so we dont need to count them
+        return self.size
     
     # O(1) - Constant time
-    def append(self, value):
+    def append(self, value, return_handle = False):
         # if head is none, that means there are no nodes in the LL, so we need to create a node and set the head to the new node.
+        # if return_handle is True we give back the new node, which can later be passed to remove_node, move_to_front, etc.
+        last_node = Node(value)
+        last_node.owner = self
         if self.head is None:
-            self.head = Node(value)
+            self.head = last_node
             self.tail = self.head # both head and tail points to the same node
         else:
             # crete a new node, 
             # point it to the last node
             # point the last's next to the new node, instead of None
             # point the tail to the new node
-            last_node = Node(value)
             last_node.previous = self.tail
             self.tail.next = last_node
             self.tail = last_node
-            
+        self.size += 1
+        if return_handle:
+            return last_node
 
     # O(1) - constant time
-    def prepend(self, value):
+    def prepend(self, value, return_handle = False):
+        first_node = Node(value)
+        first_node.owner = self
         if self.head is None:
-            self.head = Node(value)
+            self.head = first_node
             self.tail = self.head
         else:
             # crete a new node, 
             # point it's next to the first node
             # point the first's prev to the new node
             # point the head to the new node
-            first_node = Node(value)
             first_node.next = self.head
             self.head.previous = first_node
             self.head = first_node
+        self.size += 1
+        if return_handle:
+            return first_node
 
-    # O(n) - linear time
+    # O(min(index, n - index)) - we walk from whichever end is closer
     def insert(self, value, index):
-        # if the index is 0 we can use the prepend function
-        # if there is no head / or no nodes in the LL and an index is passed, we raise a value error
-        # use last as the pointer to the head and iterate until the provided index
-        # if the given index is after the last element of the LL (which is None), we raise a value error
-        # if the index is within the LL then, we create the new node, point the new node to the last node's next value and point the next of the last node to the new node.
+        # if the index is 0 we can use the prepend function, if it is the size we can use append
+        # if the index is outside the LL we raise a value error
+        # else we find the node currently at the index and link the new node right before it
         if index == 0:
             self.prepend(value)
+        elif index == self.size:
+            self.append(value)
         else:
-            if self.head is None:
-                raise ValueError("Index out of bounds")
-            else:
-                last = self.head
-                for i in range(index - 1): # because we want to find if the last element has a next value of None
-                    if last.next is None:
-                        raise ValueError("Index out of bounds")
-                    last = last.next # keep iterating until the given index is the current node's previous / last node
-                new_node = Node(value)
-                new_node.next = last.next # point the new node's next to the last's next
-                new_node.previous = last # we make this change to also point the new node's previous node
-                if last.next is not None:
-                    last.next.previous = new_node # we cut the connection to point the last's node to the new node
-                last.next = new_node
+            next_node = self._node_at(index)
+            new_node = Node(value)
+            new_node.owner = self
+            new_node.next = next_node # the new node goes between the node at the index and its previous node
+            new_node.previous = next_node.previous
+            next_node.previous.next = new_node
+            next_node.previous = new_node
+            self.size += 1
 
     # O(n) - linear time            
     def delete(self, value):
         # if we try to delete a value from the LL that isnt present we dont do anything
-        # if the value is the current head then we assign the head to the last's next
-        # if value is somewhere in between, we look ahead if current's next / last's next's next value = given value, if yes then we point the last's next to it.
+        # else we find the first node with the value and unlink it from both of its neighbours
         last = self.head
-        if last is not None:
+        while last is not None:
             if last.value == value:
-                self.head = last.next
-            else:
-                while last.next:
-                    if last.next.value == value:
-                        if last.next.next is not None:
-                            last.next.next.previous = last
-                        last.next = last.next.next
-                        break
-                    last = last.next
-
-    # O(n) - Linear time             
+                self._unlink(last)
+                break
+            last = last.next
+
+    # O(min(index, n - index)) - we walk from whichever end is closer
     def pop(self, index):
-        # if there is no head / or no nodes in the LL and an index is passed, we raise a value error
-        # if the given index is after the last element of the LL (which is None), we raise a value error
+        # if the index is outside the LL we raise a value error
+        node = self._node_at(index)
+        self._unlink(node)
+        return node.value
+
+    # O(1) - constant time
+    def pop_first(self):
         if self.head is None:
-            raise ValueError("Index out of bounds")
+            raise IndexError("LL is empty")
+        node = self.head
+        self._unlink(node)
+        return node.value
+
+    # O(1) - constant time
+    def pop_last(self):
+        if self.tail is None:
+            raise IndexError("LL is empty")
+        node = self.tail
+        self._unlink(node)
+        return node.value
+
+    # O(1) - constant time
+    def peek_first(self):
+        if self.head is None:
+            raise IndexError("LL is empty")
+        return self.head.value
+
+    # O(1) - constant time
+    def peek_last(self):
+        if self.tail is None:
+            raise IndexError("LL is empty")
+        return self.tail.value
+
+    # Handle methods - a handle is the node returned by append / prepend / insert_after
+    # because we already hold the node we dont need to search for it, we only re-point its neighbours
+
+    # O(1) - constant time
+    def remove_node(self, handle):
+        self._check_handle(handle)
+        self._unlink(handle)
+        return handle.value
+
+    # O(1) - constant time
+    def move_to_front(self, handle):
+        self._check_handle(handle)
+        if handle is self.head:
+            return
+        self._unlink(handle)
+        handle.next = self.head # we link the same node back in at the head, so the handle stays valid
+        self.head.previous = handle
+        self.head = handle
+        handle.owner = self
+        self.size += 1
+
+    # O(1) - constant time
+    def move_to_back(self, handle):
+        self._check_handle(handle)
+        if handle is self.tail:
+            return
+        self._unlink(handle)
+        handle.previous = self.tail # we link the same node back in at the tail, so the handle stays valid
+        self.tail.next = handle
+        self.tail = handle
+        handle.owner = self
+        self.size += 1
+
+    # O(1) - constant time
+    def insert_after(self, handle, value):
+        # links a new node right after the handle and returns the handle of the new node
+        self._check_handle(handle)
+        new_node = Node(value)
+        new_node.owner = self
+        new_node.previous = handle
+        new_node.next = handle.next
+        if handle.next is None: # the handle is the tail, so the new node becomes the tail
+            self.tail = new_node
         else:
-            last = self.head
-            for i in range(index - 1):
-                if last.next is None:
-                    raise ValueError("Index out of bounds")
-                last = last.next
-            if last.next is None:
-                raise ValueError("Index out of bounds")
-            else:
-                if last.next.next is not None:
-                    last.next.next.previous = last
-                last.next = last.next.next
-
-    # O(n) - Linear time
-    # This is same as singly linked list 
+            handle.next.previous = new_node
+        handle.next = new_node
+        self.size += 1
+        return new_node
+
+    # O(stop) - lazy, nothing is copied
+    # This is same as singly linked list
+    def slice(self, start, stop = None, step = 1):
+        # works like itertools.islice, the values are yielded while the LL is being walked
+        return islice(self, start, stop, step)
+
+    # O(min(index, n - index)) - we walk from whichever end is closer
     def get(self, index):
-        # same principles as the others but this time we return the value when we reach the index
-        if self.head is None:
+        return self._node_at(index).value
+
+    # helper methods
+
+    # O(min(index, n - index))
+    def _node_at(self, index): # returns the node at the index, walking from the head or from the tail, whichever is closer
+        if index < 0 or index >= self.size:
             raise ValueError("Index out of bounds")
-        else:
+        if index < self.size // 2:
             last = self.head
             for i in range(index):
-                if last.next is None:
-                    raise ValueError("Index out of bounds")
                 last = last.next
-            return last.value
+        else:
+            last = self.tail
+            for i in range(self.size - 1 - index):
+                last = last.previous
+        return last
 
+    # O(1)
+    def _unlink(self, node): # removes the node by pointing its neighbours at each other
+        if node.previous is None: # the node is the head
+            self.head = node.next
+        else:
+            node.previous.next = node.next
+        if node.next is None: # the node is the tail
+            self.tail = node.previous
+        else:
+            node.next.previous = node.previous
+        node.next = node.previous = None
+        node.owner = None
+        self.size -= 1
+
+    # O(1)
+    def _check_handle(self, handle): # the node must be in this LL, not removed and not from another LL
+        if handle.owner is not self:
+            raise ValueError("Node is not in the LL")
     
 if __name__ == "__main__":
     ll = DoublyLinkedList()
@@ -187,5 +289,20 @@ if __name__ == "__main__":
     print(2000 in ll)
 
     print(ll)
+    print(list(reversed(ll)))
+    print(list(ll.slice(0, 4)))
+
+    print(ll.pop_first())
+    print(ll.pop_last())
+    print(ll.peek_last())
+    print(ll.get(len(ll) - 2))
+    print(len(ll))
+
+    handle = ll.append(7, return_handle = True)
+    ll.move_to_front(handle)
+    ll.insert_after(handle, 8)
+    print(ll)
+    print(ll.remove_node(handle))
+    print(ll)
 
 
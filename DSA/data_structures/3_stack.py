@@ -4,6 +4,8 @@
 # pop - taking out the top element from the stack for processing
 # peek - taking a look at the top element without any processing
 
+from array import array
+
 class Node:
     def __init__(self, value):
         self.value = value
@@ -54,7 +56,88 @@ class Stack:
         return self.top is None
 
 
+# Array backed stack - the values are kept next to each other in a python list (or a typed array), instead of a node per value
+# pushing and popping at the end of a list is O(1) amortized and doesnt create a new object per push
+# with a typecode (like 'q' for 64 bit ints or 'd' for floats) the values are stored as raw numbers in an array.array, which uses far less memory
+class ArrayStack:
+    def __init__(self, typecode = None, max_depth = None):
+        self.items = [] if typecode is None else array(typecode) # the top of the stack is the last item
+        self.max_depth = max_depth # max number of items, None means no limit
+
+    # O(1) - constant time
+    def __len__(self):
+        return len(self.items)
+
+    # O(n) - linear time
+    def __repr__(self):
+        return ','.join(str(item) for item in reversed(self.items)) # same order as Stack, top first
+
+    # O(1) - amortized constant time
+    def push(self, value):
+        if self.max_depth is not None and len(self.items) >= self.max_depth:
+            raise ValueError("Stack is full")
+        self.items.append(value)
+
+    # O(k) - where k is the number of values pushed
+    def push_many(self, values):
+        # all the values are added in one extend call, the last value ends up on the top
+        # the batch is built first (a typed array checks every value), then the depth is checked, and only then the stack changes
+        # so a bad value or a full stack leaves the stack as it was, either all the values are pushed or none of them
+        batch = list(values) if isinstance(self.items, list) else array(self.items.typecode, values)
+        if self.max_depth is not None and len(self.items) + len(batch) > self.max_depth:
+            raise ValueError("Stack is full")
+        self.items.extend(batch)
+
+    # O(1) - constant time
+    def pop(self):
+        if not self.items:
+            raise ValueError("Stack is empty")
+        return self.items.pop()
+
+    # O(k) - where k is the number of values popped
+    def pop_many(self, n):
+        # returns the top n values, the top value first, like calling pop n times
+        if n > len(self.items):
+            raise ValueError("Stack has fewer than n items")
+        if n <= 0:
+            return []
+        popped = self.items[-n:][::-1]
+        del self.items[-n:]
+        return list(popped)
+
+    # O(1) - constant time
+    def peek(self):
+        if not self.items:
+            raise ValueError("Stack is empty")
+        return self.items[-1]
+
+    # O(1) - constant time
+    def is_empty(self):
+        return not self.items
+
+
+def benchmark(n = 1_000_000):
+    # compares the time and peak memory of pushing and then popping n ints with Stack and ArrayStack
+    import time
+    import tracemalloc
+
+    for name, make in (("Stack", Stack), ("ArrayStack", ArrayStack), ("ArrayStack('q')", lambda: ArrayStack('q'))):
+        stack = make()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(n):
+            stack.push(i)
+        peak = tracemalloc.get_traced_memory()[1]
+        while not stack.is_empty():
+            stack.pop()
+        elapsed = time.perf_counter() - start
+        tracemalloc.stop()
+        print(f"{name:>16}: {elapsed:6.2f} s, {peak / n:6.1f} bytes/item at peak")
+
+
 if __name__ == "__main__":
+    import sys
+
     stack = Stack()
 
     stack.push(10)
@@ -75,4 +158,15 @@ if __name__ == "__main__":
 
     print(stack.is_empty())
 
+    array_stack = ArrayStack(typecode = 'q', max_depth = 10)
+    array_stack.push_many([1, 2, 3, 4, 5])
+    array_stack.push(6)
+    print(array_stack.pop_many(3))
+    print(array_stack.peek())
+    print(array_stack)
+    print(len(array_stack))
+
+    if "--bench" in sys.argv:
+        benchmark()
+
 
@@ -3,6 +3,9 @@
 # dequeue - taking out the element from the front of the queue
 # peek - looking at the element that is about to leave the queue
 
+import threading
+import time
+
 
 class Node:
     def __init__(self, value):
@@ -46,7 +49,7 @@ class Queue:
         self.front = self.front.next # move to front pointer to the next element
         if self.front is None: # if there was only one element in the Queue after moving, then the front would point to None
             self.rear = None # we need to adjust so that the rear would also point to None, else it would be pointing to the previous element
-        self.size += 1
+        self.size -= 1 # decrease the size as we are removing 1 element
         return dequeue_value
 
     # O(1) - constant time
@@ -60,6 +63,264 @@ class Queue:
         return self.front is None # if front is None it returns True, else False
 
 
+# Ring buffer (circular buffer) queue - the values live in one python list and two numbers tell us where the queue is inside it
+# head is the index of the front element, size is the number of elements, the rear is at (head + size) % capacity
+# when we reach the end of the list we wrap around to index 0, so the free slots left by dequeue are reused
+# when the list is full we double its capacity (amortized O(1) per enqueue), and optionally halve it when it is only a quarter full
+class RingBufferQueue:
+    def __init__(self, capacity = 16, shrink = False):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.buffer = [None] * capacity
+        self.head = 0 # index of the front element
+        self.size = 0
+        self.min_capacity = capacity # we never shrink below the starting capacity
+        self.shrink = shrink
+
+    # O(1) - constant time
+    def __len__(self):
+        return self.size
+
+    # O(n) - linear time
+    def __repr__(self):
+        return ','.join(str(item) for item in self._items())
+
+    # O(1) - amortized constant time
+    def enqueue(self, value):
+        if self.size == len(self.buffer):
+            self._resize(2 * len(self.buffer))
+        self.buffer[(self.head + self.size) % len(self.buffer)] = value
+        self.size += 1
+
+    # O(k) - where k is the number of values enqueued
+    def enqueue_many(self, values):
+        # we grow once to fit all the values, then copy them in with at most two slice assignments (before and after the wrap)
+        values = list(values)
+        count = len(values)
+        if self.size + count > len(self.buffer):
+            capacity = len(self.buffer)
+            while capacity < self.size + count:
+                capacity *= 2
+            self._resize(capacity)
+        capacity = len(self.buffer)
+        rear = (self.head + self.size) % capacity
+        first = min(count, capacity - rear) # the values that fit before the end of the buffer
+        self.buffer[rear:rear + first] = values[:first]
+        self.buffer[:count - first] = values[first:]
+        self.size += count
+
+    # O(1) - constant time
+    def dequeue(self):
+        if self.size == 0:
+            raise IndexError("Queue is empty")
+        value = self.buffer[self.head]
+        self.buffer[self.head] = None # we dont want the buffer to keep the dequeued value alive
+        self.head = (self.head + 1) % len(self.buffer)
+        self.size -= 1
+        self._maybe_shrink()
+        return value
+
+    # O(k) - where k is the number of values dequeued
+    def dequeue_many(self, n):
+        # returns up to n values from the front of the queue, copied out with at most two slices
+        count = min(n, self.size)
+        if count <= 0:
+            return []
+        capacity = len(self.buffer)
+        first = min(count, capacity - self.head)
+        values = self.buffer[self.head:self.head + first] + self.buffer[:count - first]
+        self.buffer[self.head:self.head + first] = [None] * first
+        self.buffer[:count - first] = [None] * (count - first)
+        self.head = (self.head + count) % capacity
+        self.size -= count
+        self._maybe_shrink()
+        return values
+
+    # O(1) - constant time
+    def peek(self):
+        if self.size == 0:
+            raise IndexError("Queue is empty")
+        return self.buffer[self.head]
+
+    # O(1) - constant time
+    def is_empty(self):
+        return self.size == 0
+
+    # helper methods
+
+    # O(n)
+    def _items(self): # the values in queue order, from the front to the rear
+        capacity = len(self.buffer)
+        first = min(self.size, capacity - self.head)
+        return self.buffer[self.head:self.head + first] + self.buffer[:self.size - first]
+
+    # O(n)
+    def _resize(self, capacity): # copies the values to the start of a new buffer
+        items = self._items()
+        self.buffer = items + [None] * (capacity - self.size)
+        self.head = 0
+
+    # O(1) - amortized, a shrink only happens after many dequeues
+    def _maybe_shrink(self):
+        capacity = len(self.buffer)
+        if self.shrink and capacity > self.min_capacity and self.size <= capacity // 4:
+            self._resize(max(self.min_capacity, capacity // 2))
+
+
+
+class QueueClosed(Exception): # raised when enqueueing into a closed queue, or dequeueing from a closed queue that is empty
+    pass
+
+# Blocking queue - a bounded queue that many threads can share
+# producers wait while the queue is full and consumers wait while it is empty, so neither side has to busy loop
+# one lock protects the ring buffer, with two conditions on it: not_empty wakes consumers and not_full wakes producers
+# dequeue_batch hands over up to max_items in one wake up, so the lock and the thread switch are paid once per batch instead of once per item
+# close() stops new enqueues, the consumers can still take what is left and then get QueueClosed
+class BlockingQueue:
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.capacity = capacity
+        self.queue = RingBufferQueue(capacity = capacity)
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.closed = False
+        self.enqueued = 0 # total number of items enqueued
+        self.dequeued = 0 # total number of items dequeued
+        self.max_depth = 0 # the most items the queue held at once
+        self.producer_wait = 0.0 # total seconds producers spent waiting for room
+        self.consumer_wait = 0.0 # total seconds consumers spent waiting for items
+
+    # O(1) - constant time
+    def __len__(self):
+        with self.lock:
+            return len(self.queue)
+
+    # O(n) - linear time
+    def __repr__(self):
+        with self.lock:
+            return repr(self.queue)
+
+    # O(1) - constant time, plus the time spent waiting for room
+    def enqueue(self, value, block = True, timeout = None):
+        # if the queue is full we wait for room, or raise TimeoutError if there is still none after timeout seconds (or right away if block is False)
+        with self.not_full:
+            self._wait_for_room(block, timeout)
+            self.queue.enqueue(value)
+            self._enqueued(1)
+            self.not_empty.notify()
+
+    # O(k) - where k is the number of values, plus the time spent waiting for room
+    def enqueue_many(self, values, timeout = None):
+        # the values are added in chunks as room frees up, a consumer is woken for each chunk instead of each value
+        # the timeout is one deadline for the whole batch, not for each wait
+        # if it runs out (TimeoutError) or the queue is closed (QueueClosed) part way, the values before error.enqueued are in the queue,
+        # so a producer can retry with values[error.enqueued:] without adding any value twice
+        values = list(values)
+        start = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.not_full:
+            while start < len(values):
+                try:
+                    self._wait_for_room(True, None if deadline is None else max(0.0, deadline - time.monotonic()))
+                except (TimeoutError, QueueClosed) as error:
+                    error.enqueued = start
+                    raise
+                chunk = values[start:start + self.capacity - len(self.queue)]
+                self.queue.enqueue_many(chunk)
+                self._enqueued(len(chunk))
+                start += len(chunk)
+                self.not_empty.notify(len(chunk))
+
+    # O(1) - constant time, plus the time spent waiting for an item
+    def dequeue(self, block = True, timeout = None):
+        with self.not_empty:
+            if not self._wait_for_items(block, timeout):
+                raise TimeoutError("Queue is empty")
+            value = self.queue.dequeue()
+            self.dequeued += 1
+            self.not_full.notify()
+            return value
+
+    # O(k) - where k is the number of items returned, plus the time spent waiting for the first one
+    def dequeue_batch(self, max_items, timeout = None):
+        # waits until there is at least one item and returns up to max_items of them
+        # returns an empty list if nothing arrived within timeout seconds
+        with self.not_empty:
+            if not self._wait_for_items(True, timeout):
+                return []
+            values = self.queue.dequeue_many(max_items)
+            self.dequeued += len(values)
+            self.not_full.notify(len(values))
+            return values
+
+    # O(n) - linear time
+    def drain(self):
+        # takes everything that is in the queue right now without waiting
+        with self.lock:
+            values = self.queue.dequeue_many(len(self.queue))
+            self.dequeued += len(values)
+            self.not_full.notify(len(values))
+            return values
+
+    # O(1) - constant time
+    def close(self):
+        # wakes every waiting thread, producers get QueueClosed and consumers take the remaining items
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    # O(1) - constant time
+    def stats(self):
+        with self.lock:
+            return {
+                "depth": len(self.queue),
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "dequeued": self.dequeued,
+                "producer_wait": self.producer_wait,
+                "consumer_wait": self.consumer_wait,
+                "closed": self.closed,
+            }
+
+    # helper methods, they must be called with the lock held
+
+    def _wait_for_room(self, block, timeout): # returns once there is room for at least one item
+        if self.closed:
+            raise QueueClosed("Queue is closed")
+        if len(self.queue) < self.capacity:
+            return
+        if not block:
+            raise TimeoutError("Queue is full")
+        start = time.monotonic()
+        ready = self.not_full.wait_for(lambda: self.closed or len(self.queue) < self.capacity, timeout)
+        self.producer_wait += time.monotonic() - start
+        if self.closed:
+            raise QueueClosed("Queue is closed")
+        if not ready:
+            raise TimeoutError("Queue is full")
+
+    def _wait_for_items(self, block, timeout): # returns True once there is an item, False on a timeout
+        if len(self.queue):
+            return True
+        if self.closed:
+            raise QueueClosed("Queue is closed")
+        if not block:
+            return False
+        start = time.monotonic()
+        ready = self.not_empty.wait_for(lambda: self.closed or len(self.queue), timeout)
+        self.consumer_wait += time.monotonic() - start
+        if not len(self.queue) and self.closed: # closed while we were waiting, and nothing is left
+            raise QueueClosed("Queue is closed")
+        return bool(ready)
+
+    def _enqueued(self, count):
+        self.enqueued += count
+        self.max_depth = max(self.max_depth, len(self.queue))
+
+
 
 if __name__ == "__main__":
     queue = Queue()
@@ -96,6 +357,35 @@ if __name__ == "__main__":
     print(len(queue))
     print(queue)
 
+    ring_queue = RingBufferQueue(capacity = 4, shrink = True)
+    ring_queue.enqueue_many([10, 20, 30])
+    ring_queue.enqueue(40)
+    ring_queue.enqueue(50)
+    print(ring_queue.dequeue())
+    print(ring_queue.dequeue_many(2))
+    print(ring_queue.peek())
+    print(ring_queue)
+    print(len(ring_queue))
+
+    blocking_queue = BlockingQueue(capacity = 100)
+    batches = []
+
+    def consumer():
+        while True:
+            try:
+                batches.append(blocking_queue.dequeue_batch(32, timeout = 1))
+            except QueueClosed:
+                break
+
+    consumer_thread = threading.Thread(target = consumer)
+    consumer_thread.start()
+    blocking_queue.enqueue_many(range(1000))
+    blocking_queue.close()
+    consumer_thread.join()
+
+    print(sum(len(batch) for batch in batches))
+    print(blocking_queue.stats())
+
 
 
 
@@ -24,11 +24,202 @@
 # it would now look like [[], [], [], ['Mike', 'Programmer'], []]
 # worst case all the values would end up in the same list and we need to treat it like a list
 
-class HashMap:
+import hashlib
+import numbers
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from itertools import repeat
+
+try: # NumPy is optional, it is only used to hash batches of integer keys in one pass
+    import numpy as np
+except ImportError:
+    np = None
+
+# Hash functions - HashMap takes the name of one of these, or any function that turns a key into an int
+# the map stores the full hash of every entry, so it is computed once per operation and never again when we rehash
+# builtin - python's own hash(), written in C, so it is the fastest, and 1 and '1' get different hashes
+# polynomial - our own string hash below, it works on str(key), so 1 and '1' collide, and it runs in python, so it is slow for long keys
+# seeded - a keyed hash (blake2b with a random secret key), someone who doesnt know the key cannot pick keys that all collide
+# (hash flooding), with builtin that is possible for ints, because hash(n) == n for small ints
+
+# O(k) - linear in key lenght
+# O(1) - ideally if the key lenght is small, because keys are not very large
+def polynomial_hash(key):
+    # we convert the key to str first
+    # we loop through every char in the str 
+    # we find the integer result for every character using ord
+    # Multiply by 31 is a common trick to “mix” values (a small prime helps spread).\
+    # Multiply by ord(c) injects the character.
+    # & _MASK_64 keeps the number at 64 bits, so it doesnt grow into a huge int for long keys
+    # the map then takes hash % capacity to get the bucket index
+    ### Tiny example (capacity = 10, key = "ab") ###
+    # start h = 0
+    # 'a' (97): h = 0*31 + 97 = 97
+    # 'b' (98): h = 97*31 + 98 = 3105
+    # 3105 % 10 = 5, so "ab" goes to index 5.
+    key_string = str(key)
+    hash_result = 0
+    for c in key_string:
+        hash_result = (hash_result * 31 + ord(c)) & _MASK_64
+    return hash_result
+
+
+# O(k) - linear in key lenght, but done in C
+def seeded_hash_function(seed = None):
+    # returns a hash function keyed with the seed (16 random bytes if none is given)
+    # keys that are equal must get equal hashes, so numbers that are equal to an int (True, 1.0, Fraction(1), Decimal(1), 1 + 0j) are hashed as that int
+    # other keys, including numbers that are not whole, fall back to the builtin hash, which already gives equal numbers equal hashes
+    secret = os.urandom(16) if seed is None else hashlib.blake2b(str(seed).encode(), digest_size = 16).digest()
+
+    def seeded_hash(key):
+        if isinstance(key, str):
+            data = b's' + key.encode('utf-8', 'surrogatepass')
+        elif isinstance(key, bytes):
+            data = b'b' + key
+        else:
+            number = _integral_value(key)
+            if number is not None:
+                data = b'i' + number.to_bytes((number.bit_length() + 8) // 8, 'little', signed = True)
+            else:
+                data = b'h' + hash(key).to_bytes(8, 'little', signed = True)
+        return int.from_bytes(hashlib.blake2b(data, key = secret, digest_size = 8).digest(), 'little')
+    return seeded_hash
+
+
+def _integral_value(key): # the int that a number key is equal to, or None if it isnt a number equal to an int
+    if isinstance(key, int):
+        return int(key)
+    if not isinstance(key, numbers.Number):
+        return None
+    if isinstance(key, numbers.Complex) and not isinstance(key, numbers.Real):
+        if key.imag != 0:
+            return None
+        key = key.real
+    try:
+        number = int(key)
+    except (TypeError, ValueError, OverflowError): # nan, inf, or a number type that cant become an int
+        return None
+    return number if number == key else None
+
+
+_MASK_64 = (1 << 64) - 1
+_FIBONACCI = 0x9E3779B97F4A7C15 # 2^64 divided by the golden ratio, used to spread hashes over the shards
+_HASH_MODULUS = sys.hash_info.modulus # 2^61 - 1 on 64 bit builds
+_EMPTY = object() # marks a missing value or a free slot, no key or value can be this object
+
+HASH_FUNCTIONS = {
+    'builtin': lambda: hash,
+    'polynomial': lambda: polynomial_hash,
+    'seeded': seeded_hash_function,
+}
+
+
+def _is_numpy_array(keys):
+    return np is not None and isinstance(keys, np.ndarray)
+
+
+# O(k) - vectorized
+def _builtin_hash_array(keys):
+    # gives the same numbers as calling hash() on every int in the array, in one pass over the array
+    # python hashes an int n as n % (2^61 - 1), keeping the sign of n, except that -1 becomes -2 (-1 means an error in C)
+    keys = keys.astype(np.int64) if keys.dtype.kind == 'i' else keys.astype(np.uint64)
+    negative = keys < 0
+    magnitude = np.where(negative, (-(keys + 1)).astype(np.uint64) + np.uint64(1), keys.astype(np.uint64)) # abs without overflowing at the smallest int64
+    magnitude = (magnitude % np.uint64(_HASH_MODULUS)).astype(np.int64)
+    hashes = np.where(negative, -magnitude, magnitude)
+    hashes[hashes == -1] = -2
+    return hashes
+
+
+def _get_hasher(hash_function): # turns the hash_function argument of a map into a function
+    if callable(hash_function):
+        return hash_function
+    if hash_function not in HASH_FUNCTIONS:
+        raise ValueError(f"Unknown hash function {hash_function!r}")
+    return HASH_FUNCTIONS[hash_function]()
+
+
+# Resizing - when there are many more elements than buckets, every bucket turns into a long list and we are back to linear scans
+# so we keep the load factor (size / capacity) between min_load_factor and max_load_factor
+# when it goes over the max we double the number of buckets, when it goes under the min we halve it
+# moving every element to the new buckets at once would make that one put very slow, so we rehash incrementally:
+# we keep both the old and the new buckets for a while, and every operation moves a few old buckets over (rehash_step)
+# old buckets before rehash_index were already moved, so a key whose old index is smaller than rehash_index lives in the new buckets
+# Segmented buckets - even a list of m Nones takes milliseconds to create and free when m is in the millions, and it would be done
+# by the one put that starts (or finishes) the rehash. So the buckets live in fixed size segments of SEGMENT_SIZE buckets,
+# found through a directory (a dict: segment number -> segment). A segment is only created when the first key lands in it,
+# and the rehash releases every old segment as soon as it has moved past it, so starting and finishing a rehash is O(1)
+
+SEGMENT_SIZE = 1024 # a power of two
+
+
+class _Buckets:
     def __init__(self, capacity):
+        self.capacity = capacity
+        self.shift = min(SEGMENT_SIZE, capacity).bit_length() - 1 # the segment size is a power of two, so index >> shift is the segment
+        self.segment_size = 1 << self.shift
+        self.mask = self.segment_size - 1 # and index & mask is the bucket inside it
+        self.segments = {} # segment number -> list of segment_size buckets, a bucket is None until a key lands in it
+
+    # O(1)
+    def __len__(self):
+        return self.capacity
+
+    # O(m) - unused buckets are yielded as None
+    def __iter__(self):
+        for number in range(-(-self.capacity // self.segment_size)):
+            segment = self.segments.get(number)
+            if segment is None:
+                yield from repeat(None, self._segment_length(number))
+            else:
+                yield from segment
+
+    # O(m)
+    def __repr__(self):
+        return repr([bucket if bucket is not None else [] for bucket in self])
+
+    # O(1) - plus O(SEGMENT_SIZE) the first time a segment is used
+    def bucket(self, index, create = False): # returns the bucket at index, an empty tuple if it is unused, or a new list if create is True
+        number, offset = index >> self.shift, index & self.mask
+        segment = self.segments.get(number)
+        if segment is None:
+            if not create:
+                return ()
+            segment = self.segments[number] = [None] * self._segment_length(number)
+        bucket = segment[offset]
+        if bucket is None:
+            if not create:
+                return ()
+            bucket = segment[offset] = []
+        return bucket
+
+    # O(1)
+    def _segment_length(self, number): # the last segment is shorter if the capacity isnt a multiple of the segment size
+        return min(self.segment_size, self.capacity - number * self.segment_size)
+
+
+class HashMap:
+    def __init__(self, capacity = 8, max_load_factor = 0.75, min_load_factor = None, rehash_step = 4, hash_function = 'builtin'):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
         self.capacity = capacity # capacity is the number of buckets we look to create
+        self.min_capacity = capacity # we never shrink below the starting capacity
+        self.max_load_factor = max_load_factor
+        self.min_load_factor = max_load_factor / 4 if min_load_factor is None else min_load_factor
+        self.rehash_step = rehash_step # number of old buckets moved per operation while rehashing
+        self.hasher = _get_hasher(hash_function) # 'builtin', 'polynomial', 'seeded' or any function key -> int
         self.size = 0 # The number of elements in the bucket
-        self.buckets = [[] for _ in range(capacity)]
+        self.buckets = _Buckets(capacity)
+        self.new_buckets = None # the buckets we are moving to, only set while rehashing
+        self.rehash_index = 0 # the next old bucket to move
+        self.version = 0 # changes whenever a key is added or removed, so that iterations can detect it
+        self.resizes = 0 # number of times the buckets were grown or shrunk
+        self.timer = None # set by enable_timing
     
     # O(1)
     def __len__(self):
@@ -38,85 +229,778 @@ class HashMap:
     # Average: O(1)
     # depends on the quality of the hash function
     def __contains__(self, key):
-        index = self._hash_function(key) # convert key to its hash index
-        bucket = self.buckets[index] # retreive the bucket with that index
-        for k, v in bucket: # every bucket stores both its key & value like [(k, v)]
-            if k == key: 
-                return True
-        return False
+        return self._contains(self._hash_function(key), key) # the full hash is computed once per operation
 
     # Worst: O(n)
     # Average: O(1)
     # depends on the quality of the hash function
     def put(self, key, value):
-        index = self._hash_function(key) # convert key to its hash index
-        bucket = self.buckets[index] # retreive the bucket with that index
-        for i, (k, v) in enumerate(bucket): # we go through all the elements in the bucket
-            if k == key: # if we find a key
-                bucket[i] = (key, value) # we update the value
-                break # if key key is found, then we break out, so the next lines wont execute
-        else: # if key isnt found, we dont break out of the above loop, then the below lines executes (for else python syntax)
-            bucket.append((key, value)) # we append the new key and value in the buckets index
-            self.size += 1
+        self._put(self._hash_function(key), key, value)
 
     # Worst: O(n)
     # Average: O(1)
     # depends on the quality of the hash function
     def get(self, key):
-        index = self._hash_function(key) # convert key to its hash index
-        bucket = self.buckets[index] # retreive the bucket with that index
-        for k, v in bucket: # every bucket stores both its key & value like [(k, v)]
-            if k == key: 
-                return v
-        raise KeyError("Key not present")
+        value = self._get(self._hash_function(key), key, _EMPTY)
+        if value is _EMPTY:
+            raise KeyError("Key not present")
+        return value
 
     # Worst: O(n)
     # Average: O(1)
     # depends on the quality of the hash function
     def remove(self, key):
-        index = self._hash_function(key) # convert key to its hash index
-        bucket = self.buckets[index] # retreive the bucket with that index
-        for i, (k, v) in enumerate(bucket): # every bucket stores both its key & value like [(k, v)]
-            if k == key: 
+        key_hash = self._hash_function(key)
+        self._rehash_some()
+        bucket = self._bucket(key_hash) # retreive the bucket of the key
+        for i, (h, k, v) in enumerate(bucket):
+            if h == key_hash and (k is key or k == key):
                 del bucket[i]
                 self.size -= 1
+                self.version += 1
+                self._check_load()
                 break
         else: # for else syntax
             raise KeyError("Key not present")
 
-    # O(m + n) = O(n)
+    # Batch methods - they take many keys in one call, so the python overhead of a method call per key is paid once
+    # get_many and contains_many finish any rehash first, so the capacity is fixed and the bucket of every key is known up front
+    # if the keys are a NumPy integer array and the map uses the builtin hash, the hashes and the bucket indexes are computed
+    # in one vectorized pass, and the only python left per key is scanning its bucket
+
+    # O(k) - average, where k is the number of keys
+    def put_many(self, keys, values):
+        keys, hashes = self._hash_many(keys)
+        values = list(values)
+        if len(values) != len(keys): # checked before anything is added, zip would silently drop the extra keys
+            raise ValueError("keys and values must have the same length")
+        for key_hash, key, value in zip(hashes, keys, values):
+            self._put(key_hash, key, value)
+
+    # O(k) - average
+    def get_many(self, keys, default = None):
+        # returns the value of every key, or default for the keys that are not present
+        # for a NumPy array of keys the result is a NumPy array too, of dtype object, so values like lists or tuples stay single items
+        is_array = _is_numpy_array(keys)
+        results = [default if value is _EMPTY else value for value in self._find_many(keys)]
+        if is_array:
+            array_results = np.empty(len(results), dtype = object) # np.array(results) would turn list values into extra dimensions
+            array_results[:] = results
+            return array_results
+        return results
+
+    # O(k) - average
+    def contains_many(self, keys):
+        # returns True or False for every key, for a NumPy array of keys the result is a boolean NumPy array (a mask)
+        is_array = _is_numpy_array(keys)
+        results = [value is not _EMPTY for value in self._find_many(keys)]
+        return np.array(results, dtype = bool) if is_array else results
+
+    # O(m + n) = O(n) - to iterate, the keys are yielded one by one, nothing is copied
+    def __iter__(self):
+        for k, _ in self._entries():
+            yield k
+
+    # O(1) - the views are lazy, they read the map when they are iterated, like dict.keys()
     def keys(self):
-        return [k for bucket in self.buckets for k, _ in bucket]
+        return KeysView(self)
 
-    # O(m + n) = O(n)
+    # O(1)
     def values(self):
-        return [v for bucket in self.buckets for _, v in bucket]
+        return ValuesView(self)
 
-    # O(m + n) = O(n)
+    # O(1)
     def items(self):
-        return [(k,v) for bucket in self.buckets for k, v in bucket]
-
-    # O(k) - linear in key lenght
-    # O(1) - ideally if the key lenght is small, because keys are not very large
-    def _hash_function(self, key):
-        # we convert the key to str first
-        # we loop through every char in the str 
-        # we find the integer result for every character using ord
-        # Multiply by 31 is a common trick to “mix” values (a small prime helps spread).\
-        # Multiply by ord(c) injects the character.
-        # % self.capacity keeps it within valid bucket range.
-        ### Tiny example (capacity = 10, key = "ab") ###
-        # Using the fixed formula:
-        # start h = 0
-        # 'a' (97): h = (0*31 + 97) % 10 = 7
-        # 'b' (98): h = (7*31 + 98) % 10 = (217 + 98) % 10 = 315 % 10 = 5
-        # So "ab" hashes to index 5.
-        key_string = str(key)
-        hash_result = 0
-        for c in key_string:
-            hash_result = (hash_result * 31 + ord(c)) % self.capacity
-        return hash_result
+        return ItemsView(self)
+
+    # O(1)
+    def load_factor(self): # while rehashing it is measured against the new capacity, the one the keys are moving to
+        return self.size / (len(self.new_buckets) if self.new_buckets is not None else self.capacity)
 
+    # O(m + n) - it looks at every bucket, so call it when the metrics are scraped, not on every operation
+    def stats(self):
+        # a plain dict with how full the buckets are, to spot a bad key distribution (long chains mean linear scans)
+        # collisions is the number of keys that share their bucket with a key before them
+        histogram = {} # chain length -> number of buckets with that length
+        for bucket in self._all_buckets():
+            histogram[len(bucket)] = histogram.get(len(bucket), 0) + 1
+        used_buckets = sum(count for length, count in histogram.items() if length)
+        stats = {
+            "size": self.size,
+            "capacity": self.capacity,
+            "new_capacity": len(self.new_buckets) if self.new_buckets is not None else None, # the capacity we are rehashing to
+            "load_factor": self.load_factor(), # over new_capacity while rehashing, like load_factor()
+            "chain_length_histogram": dict(sorted(histogram.items())),
+            "max_chain_length": max(histogram),
+            "mean_chain_length": self.size / used_buckets if used_buckets else 0.0, # over the non empty buckets
+            "collisions": self.size - used_buckets,
+            "resizes": self.resizes,
+            "rehashing": self.new_buckets is not None,
+        }
+        if self.timer is not None:
+            stats["timings"] = self.timer.stats()
+        return stats
+
+    # O(1)
+    def enable_timing(self, sample_rate = 0.01):
+        # times about sample_rate of the put, get and remove calls, the results show up in stats()["timings"]
+        # the timed methods are only put on this instance, so a map that never enables timing pays nothing for it
+        self.timer = _OperationTimer(self, sample_rate)
+
+    # O(1)
+    def disable_timing(self):
+        if self.timer is not None:
+            self.timer.unwrap(self)
+            self.timer = None
+
+    # helper methods
+
+    # O(m + n)
+    def _entries(self): # yields every (key, value), used by the views
+        # adding or removing a key while we iterate would make us skip or repeat entries, so we raise instead
+        # moving buckets would do the same, so we finish any rehash before we start, the iteration is O(n) anyway
+        # after that only adding or removing a key can start a rehash, and that already ends the iteration
+        self._finish_rehash()
+        version = self.version
+        for bucket in self._all_buckets():
+            for _, k, v in bucket:
+                if self.version != version:
+                    raise RuntimeError("HashMap changed size during iteration")
+                yield k, v
+        if self.version != version:
+            raise RuntimeError("HashMap changed size during iteration")
+
+    # Average: O(1)
+    def _contains(self, key_hash, key):
+        return self._get(key_hash, key, _EMPTY) is not _EMPTY
+
+    # Average: O(1)
+    def _get(self, key_hash, key, default): # returns the value of the key, or default if it is not present
+        self._rehash_some()
+        for h, k, v in self._bucket(key_hash): # every bucket stores the full hash, the key & value like [(h, k, v)]
+            if h == key_hash and (k is key or k == key): # comparing the hashes first is cheap and skips most keys
+                return v
+        return default
+
+    # Average: O(1)
+    def _put(self, key_hash, key, value):
+        self._rehash_some()
+        bucket = self._bucket(key_hash, create = True) # retreive the bucket of the key
+        for i, (h, k, v) in enumerate(bucket): # we go through all the elements in the bucket
+            if h == key_hash and (k is key or k == key): # if we find a key
+                bucket[i] = (key_hash, key, value) # we update the value
+                break # if key key is found, then we break out, so the next lines wont execute
+        else: # if key isnt found, we dont break out of the above loop, then the below lines executes (for else python syntax)
+            bucket.append((key_hash, key, value)) # we append the new key and value in the buckets index
+            self.size += 1
+            self.version += 1
+            self._check_load()
+
+    # O(k) - average
+    def _find_many(self, keys): # returns the value of every key, or _EMPTY for the keys that are not present
+        self._finish_rehash() # from here on the keys cant move, so we can go straight to the buckets
+        buckets = self.buckets
+        if _is_numpy_array(keys) and keys.dtype.kind in 'iu' and self.hasher is hash:
+            hashes = _builtin_hash_array(keys)
+            indexes = hashes % self.capacity # numpy % keeps the sign of the divisor, like python, so the indexes are never negative
+            numbers, offsets = (indexes >> buckets.shift).tolist(), (indexes & buckets.mask).tolist()
+            keys, hashes = keys.tolist(), hashes.tolist()
+        else:
+            keys, hashes = self._hash_many(keys)
+            indexes = [key_hash % self.capacity for key_hash in hashes]
+            numbers, offsets = [index >> buckets.shift for index in indexes], [index & buckets.mask for index in indexes]
+        get_segment = buckets.segments.get # local names, this loop is the whole cost of the batch
+        results = []
+        append = results.append
+        for key, key_hash, number, offset in zip(keys, hashes, numbers, offsets):
+            segment = get_segment(number)
+            if segment is not None:
+                bucket = segment[offset]
+                if bucket:
+                    for h, k, v in bucket:
+                        if h == key_hash and (k is key or k == key):
+                            append(v)
+                            break
+                    else:
+                        append(_EMPTY)
+                    continue
+            append(_EMPTY)
+        return results
+
+    # O(k)
+    def _hash_many(self, keys): # returns the keys as a list and their full hashes
+        if _is_numpy_array(keys) and keys.dtype.kind in 'iu' and self.hasher is hash:
+            return keys.tolist(), _builtin_hash_array(keys).tolist() # tolist gives python ints, the same keys a single put would store
+        keys = list(keys)
+        hasher = self.hasher
+        return keys, [hasher(key) for key in keys]
+
+    # O(1)
+    def _bucket(self, key_hash, create = False): # returns the bucket that holds the key, or where it should be added
+        # a bucket that was never used is an empty tuple, or a new list if we are about to add to it
+        # this runs on every operation, so the common case (the bucket exists) is looked up here without another method call
+        buckets = self.buckets
+        index = key_hash % self.capacity
+        if self.new_buckets is not None and index < self.rehash_index: # this old bucket was already moved
+            buckets = self.new_buckets
+            index = key_hash % buckets.capacity
+        segment = buckets.segments.get(index >> buckets.shift)
+        if segment is not None:
+            bucket = segment[index & buckets.mask]
+            if bucket is not None:
+                return bucket
+        return buckets.bucket(index, create = True) if create else ()
+
+    # O(m) - m is the number of buckets
+    def _all_buckets(self): # the old buckets and, while rehashing, the new ones, an unused bucket is an empty tuple
+        for bucket in self.buckets:
+            yield bucket if bucket is not None else ()
+        if self.new_buckets is not None:
+            for bucket in self.new_buckets:
+                yield bucket if bucket is not None else ()
+
+    # O(1)
+    def _check_load(self): # starts a rehash if the load factor left the allowed range
+        if self.new_buckets is not None: # we are already rehashing
+            return
+        if self.size > self.capacity * self.max_load_factor:
+            self._start_rehash(self.capacity * 2)
+        elif self.size < self.capacity * self.min_load_factor and self.capacity > self.min_capacity:
+            self._start_rehash(max(self.min_capacity, self.capacity // 2))
+
+    # O(1) - the segments of the new buckets are created as keys land in them
+    def _start_rehash(self, capacity):
+        self.new_buckets = _Buckets(capacity)
+        self.rehash_index = 0
+        self.resizes += 1
+
+    # O(rehash_step) - amortized
+    def _rehash_some(self):
+        # moves up to rehash_step non empty old buckets, and skips at most 10 times as many empty ones, so a step is always short
+        # the entries keep their full hash, so moving them never calls the hash function again
+        if self.new_buckets is None:
+            return
+        moved = 0
+        visited = 0
+        new_buckets = self.new_buckets
+        new_capacity = new_buckets.capacity
+        segments = self.buckets.segments
+        segment_size, shift, mask = self.buckets.segment_size, self.buckets.shift, self.buckets.mask
+        while self.rehash_index < self.capacity and moved < self.rehash_step and visited < 10 * self.rehash_step:
+            number, offset = self.rehash_index >> shift, self.rehash_index & mask
+            segment = segments.get(number)
+            visited += 1
+            if segment is None: # no key ever landed in this segment, so we skip all of it
+                self.rehash_index = min(self.capacity, (number + 1) * segment_size)
+                continue
+            bucket = segment[offset]
+            if bucket:
+                for entry in bucket:
+                    new_buckets.bucket(entry[0] % new_capacity, create = True).append(entry)
+                segment[offset] = None
+                moved += 1
+            self.rehash_index += 1
+            if offset + 1 == len(segment): # we moved past the end of the segment, so we release it
+                del segments[number]
+        if self.rehash_index == self.capacity: # every old bucket was moved, so the new buckets become the buckets
+            self.buckets = self.new_buckets
+            self.capacity = new_capacity
+            self.new_buckets = None
+            self.rehash_index = 0
+            self._check_load() # the size might have left the range again while we were rehashing
+
+    # O(n) - at most, when a rehash was just started
+    def _finish_rehash(self): # moves all the old buckets that are left
+        while self.new_buckets is not None:
+            self._rehash_some()
+
+    # depends on the hash function, see the hash functions above the class
+    def _hash_function(self, key): # returns the full hash of the key, the bucket index is the full hash % capacity
+        return self.hasher(key)
+
+
+# Open addressing - instead of a list per bucket, every slot holds at most one key, and a collision moves the key to a later slot
+# the keys, values and hashes are kept in three flat arrays (parallel arrays), slot i is slot_keys[i], slot_values[i], slot_hashes[i]
+# there are no bucket lists and no (key, value) tuples, so it uses much less memory and the probes walk neighbouring slots
+# we use linear probing (try the next slot) with the Robin Hood rule:
+# the distance of a key is how far it sits from its home slot (hash % capacity)
+# while inserting, if the key we carry is further from home than the key in the slot, they swap and we carry the other one on
+# this keeps the distances short and even, and a lookup can stop as soon as it meets a key that is closer to home than it would be
+# Backward shift deletion - after removing a key we shift the following keys back one slot until a key that is at home or an empty slot,
+# so we never need tombstones (deleted markers) that would slow the lookups down
+
+class OpenAddressingHashMap:
+    def __init__(self, capacity = 8, max_load_factor = 0.8, hash_function = 'builtin'):
+        hasher = _get_hasher(hash_function)
+        # the hashes are stored as signed 64 bit numbers, hash() of an int always fits, so we pass other hash functions through it
+        self.hasher = hasher if hasher is hash else lambda key: hash(hasher(key))
+        size = 1
+        while size < capacity: # a power of two, so that hash % capacity is just hash & mask
+            size *= 2
+        self.max_load_factor = max_load_factor
+        self.size = 0
+        self.version = 0 # changes whenever a key is added or removed, so that iterations can detect it
+        self.resizes = 0
+        self.timer = None # set by enable_timing
+        self._allocate(size)
+
+    # O(1)
+    def __len__(self):
+        return self.size
+
+    # Average: O(1)
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    # Average: O(1) - amortized, because of the resize
+    def put(self, key, value):
+        key_hash = self.hasher(key)
+        index = self._find(key, key_hash)
+        if index >= 0: # update in place, nothing is allocated
+            self.slot_values[index] = value
+            return
+        if self.size + 1 > self.capacity * self.max_load_factor:
+            self._resize(self.capacity * 2)
+        self._insert(key_hash, key, value)
+        self.size += 1
+        self.version += 1
+
+    # Average: O(1)
+    def get(self, key):
+        index = self._find(key)
+        if index < 0:
+            raise KeyError("Key not present")
+        return self.slot_values[index]
+
+    # Average: O(1)
+    def remove(self, key):
+        index = self._find(key)
+        if index < 0:
+            raise KeyError("Key not present")
+        keys, values, hashes, mask = self.slot_keys, self.slot_values, self.slot_hashes, self.mask
+        next_index = (index + 1) & mask
+        while keys[next_index] is not _EMPTY and (next_index - hashes[next_index]) & mask != 0: # the next key isnt at home, so it moves back one slot
+            keys[index], values[index], hashes[index] = keys[next_index], values[next_index], hashes[next_index]
+            index = next_index
+            next_index = (index + 1) & mask
+        keys[index] = _EMPTY
+        values[index] = None
+        self.size -= 1
+        self.version += 1
+
+    # O(m) - m is the number of slots, the keys are yielded one by one
+    def __iter__(self):
+        for k, _ in self._entries():
+            yield k
+
+    # O(1) - lazy views, same as HashMap
+    def keys(self):
+        return KeysView(self)
+
+    # O(1)
+    def values(self):
+        return ValuesView(self)
+
+    # O(1)
+    def items(self):
+        return ItemsView(self)
+
+    # O(1)
+    def load_factor(self):
+        return self.size / self.capacity
+
+    # O(m) - looks at every slot, so call it when the metrics are scraped
+    def stats(self):
+        # like HashMap.stats, but with probe lengths: how many slots a lookup of each key walks past its home slot
+        histogram = {} # probe length -> number of keys with that length
+        mask = self.mask
+        for index, (k, key_hash) in enumerate(zip(self.slot_keys, self.slot_hashes)):
+            if k is not _EMPTY:
+                distance = (index - key_hash) & mask
+                histogram[distance] = histogram.get(distance, 0) + 1
+        stats = {
+            "size": self.size,
+            "capacity": self.capacity,
+            "load_factor": self.load_factor(),
+            "probe_length_histogram": dict(sorted(histogram.items())),
+            "max_probe_length": max(histogram, default = 0),
+            "mean_probe_length": sum(length * count for length, count in histogram.items()) / self.size if self.size else 0.0,
+            "collisions": self.size - histogram.get(0, 0), # keys that are not in their home slot
+            "resizes": self.resizes,
+        }
+        if self.timer is not None:
+            stats["timings"] = self.timer.stats()
+        return stats
+
+    enable_timing = HashMap.enable_timing
+    disable_timing = HashMap.disable_timing
+
+    # helper methods
+
+    # O(m)
+    def _entries(self): # yields every (key, value), and raises if a key is added or removed meanwhile
+        version = self.version
+        for k, v in zip(self.slot_keys, self.slot_values):
+            if self.version != version:
+                raise RuntimeError("HashMap changed size during iteration")
+            if k is not _EMPTY:
+                yield k, v
+        if self.version != version:
+            raise RuntimeError("HashMap changed size during iteration")
+
+    # O(m)
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.slot_keys = [_EMPTY] * capacity
+        self.slot_values = [None] * capacity
+        self.slot_hashes = array('q', bytes(8 * capacity)) # 8 bytes per slot, no python int objects
+
+    # Average: O(1)
+    def _find(self, key, key_hash = None): # returns the slot of the key or -1
+        if key_hash is None:
+            key_hash = self.hasher(key)
+        keys, hashes, mask = self.slot_keys, self.slot_hashes, self.mask
+        index = key_hash & mask
+        distance = 0
+        while True:
+            k = keys[index]
+            if k is _EMPTY:
+                return -1
+            slot_hash = hashes[index]
+            if slot_hash == key_hash and (k is key or k == key):
+                return index
+            if (index - slot_hash) & mask < distance: # Robin Hood: our key would have taken this slot, so it isnt in the map
+                return -1
+            index = (index + 1) & mask
+            distance += 1
+
+    # Average: O(1)
+    def _insert(self, key_hash, key, value): # inserts a key that we know is not in the map yet
+        keys, values, hashes, mask = self.slot_keys, self.slot_values, self.slot_hashes, self.mask
+        index = key_hash & mask
+        distance = 0
+        while keys[index] is not _EMPTY:
+            slot_distance = (index - hashes[index]) & mask
+            if slot_distance < distance: # the key in the slot is closer to home, so we take its slot and carry it on
+                keys[index], key = key, keys[index]
+                values[index], value = value, values[index]
+                hashes[index], key_hash = key_hash, hashes[index]
+                distance = slot_distance
+            index = (index + 1) & mask
+            distance += 1
+        keys[index], values[index], hashes[index] = key, value, key_hash
+
+    # O(n)
+    def _resize(self, capacity):
+        self.resizes += 1
+        old = [(h, k, v) for h, k, v in zip(self.slot_hashes, self.slot_keys, self.slot_values) if k is not _EMPTY]
+        self._allocate(capacity)
+        for key_hash, key, value in old:
+            self._insert(key_hash, key, value)
+
+
+# Timing - enable_timing wraps put, get and remove of one map instance with methods that time a random sample of the calls
+# only sampled calls read the clock, and a map without timing runs the normal class methods, untouched
+
+class _OperationTimer:
+    OPERATIONS = ('put', 'get', 'remove')
+    KEEP = 1024 # number of recent samples kept per operation for the percentiles
+
+    def __init__(self, mapping, sample_rate):
+        self.sample_rate = sample_rate
+        self.counts = {name: 0 for name in self.OPERATIONS} # number of sampled calls
+        self.total = {name: 0 for name in self.OPERATIONS} # total nanoseconds of the sampled calls
+        self.max = {name: 0 for name in self.OPERATIONS}
+        self.recent = {name: deque(maxlen = self.KEEP) for name in self.OPERATIONS}
+        for name in self.OPERATIONS:
+            setattr(mapping, name, self._timed(name, getattr(mapping, name))) # an instance attribute hides the class method
+
+    def unwrap(self, mapping):
+        for name in self.OPERATIONS:
+            delattr(mapping, name)
+
+    # O(1) - per call
+    def _timed(self, name, method):
+        rate = self.sample_rate
+
+        def timed(*args, **kwargs):
+            if random.random() >= rate:
+                return method(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                self.counts[name] += 1
+                self.total[name] += elapsed
+                self.max[name] = max(self.max[name], elapsed)
+                self.recent[name].append(elapsed)
+        return timed
+
+    # O(k log k) - k is the number of recent samples
+    def stats(self):
+        result = {}
+        for name in self.OPERATIONS:
+            recent = sorted(self.recent[name])
+            count = self.counts[name]
+            result[name] = {
+                "samples": count,
+                "mean_ns": self.total[name] / count if count else 0.0,
+                "max_ns": self.max[name],
+                "p50_ns": recent[len(recent) // 2] if recent else 0,
+                "p99_ns": recent[min(len(recent) - 1, len(recent) * 99 // 100)] if recent else 0,
+            }
+        return result
+
+
+# Views - what keys(), values() and items() return
+# they dont copy anything, they just hold the map and read it when they are used, so a map with millions of entries costs no extra memory
+# len is O(1), iterating is O(n), and adding or removing keys while iterating raises a RuntimeError (updating a value is fine)
+
+class KeysView:
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    # O(1)
+    def __len__(self):
+        return len(self.mapping)
+
+    # O(n)
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self)})"
+
+    # Average: O(1)
+    def __contains__(self, key):
+        return key in self.mapping
+
+    # O(n)
+    def __iter__(self):
+        for k, _ in self.mapping._entries():
+            yield k
+
+class ValuesView(KeysView):
+    # O(n) - values are not hashed, so we have to look at every one of them
+    def __contains__(self, value):
+        for v in self:
+            if v is value or v == value:
+                return True
+        return False
+
+    # O(n)
+    def __iter__(self):
+        for _, v in self.mapping._entries():
+            yield v
+
+class ItemsView(KeysView):
+    # Average: O(1) - we look the key up and compare its value
+    def __contains__(self, item):
+        key, value = item
+        try:
+            v = self.mapping.get(key)
+        except KeyError:
+            return False
+        return v is value or v == value
+
+    # O(n)
+    def __iter__(self):
+        return self.mapping._entries()
+
+
+# Lock striping - a map that many threads can share
+# one lock around the whole map would make every thread wait for every other thread
+# so we split the keys over several shards (each one a HashMap with its own lock), a key always goes to the same shard
+# threads that work on keys in different shards never wait for each other, and every shard resizes on its own
+# the shard is picked from the high bits of the hash multiplied by a large odd number (Fibonacci hashing),
+# the low bits pick the bucket inside the shard, so using them for the shard too would leave most buckets of a shard empty
+
+class ConcurrentHashMap:
+    def __init__(self, shards = 16, capacity = 8, hash_function = 'builtin', **options):
+        bits = max(0, (shards - 1).bit_length()) # we round the number of shards up to a power of two
+        self.shift = 64 - bits
+        self.hasher = _get_hasher(hash_function)
+        self.shards = [HashMap(capacity = capacity, hash_function = self.hasher, **options) for _ in range(1 << bits)]
+        self.locks = [threading.Lock() for _ in self.shards]
+
+    # O(s) - s is the number of shards, the count is only exact if no other thread is writing
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    # Average: O(1)
+    def __contains__(self, key):
+        key_hash, shard, lock = self._shard(key)
+        with lock:
+            return shard._contains(key_hash, key)
+
+    # Average: O(1)
+    def put(self, key, value):
+        key_hash, shard, lock = self._shard(key)
+        with lock:
+            shard._put(key_hash, key, value)
+
+    # Average: O(1)
+    def get(self, key):
+        key_hash, shard, lock = self._shard(key)
+        with lock:
+            value = shard._get(key_hash, key, _EMPTY)
+        if value is _EMPTY:
+            raise KeyError("Key not present")
+        return value
+
+    # Average: O(1)
+    def remove(self, key):
+        key_hash, shard, lock = self._shard(key)
+        with lock:
+            shard.remove(key)
+
+    # The methods below check and change a key while holding the lock of its shard, so no other thread can get in between
+
+    # Average: O(1)
+    def put_if_absent(self, key, value):
+        # adds the key only if it isnt present, returns the value that was already there or None if it was added
+        key_hash, shard, lock = self._shard(key)
+        with lock:
+            current = shard._get(key_hash, key, _EMPTY)
+            if current is _EMPTY:
+                shard._put(key_hash, key, value)
+                return None
+            return current
+
+    # Average: O(1) - plus the cost of factory
+    def get_or_insert(self, key, factory):
+        # returns the value of the key, if it isnt present factory() is called (only once, even if many threads race) and stored
+        key_hash, shard, lock = self._shard(key)
+        with lock:
+            current = shard._get(key_hash, key, _EMPTY)
+            if current is _EMPTY:
+                current = factory()
+                shard._put(key_hash, key, current)
+            return current
+
+    # Average: O(1) - plus the cost of function
+    def compute(self, key, function):
+        # stores function(key, old_value) and returns it, old_value is None if the key isnt present
+        # if function returns None the key is removed
+        # function runs while the shard is locked, so it must not use this map
+        key_hash, shard, lock = self._shard(key)
+        with lock:
+            current = shard._get(key_hash, key, _EMPTY)
+            value = function(key, None if current is _EMPTY else current)
+            if value is not None:
+                shard._put(key_hash, key, value)
+            elif current is not _EMPTY:
+                shard.remove(key)
+            return value
+
+    # Weakly consistent iteration - we copy one shard at a time while holding only its lock
+    # other threads can keep writing to the other shards, so we never block the whole map
+    # changes made during the iteration may or may not show up, but every key appears at most once
+
+    # O(n)
+    def items(self):
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard_items = list(shard.items())
+            yield from shard_items
+
+    # O(n)
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    # O(n)
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    # helper methods
+
+    # O(1) - plus the hash of the key
+    def _shard(self, key): # returns the full hash of the key, its shard and the lock of the shard
+        key_hash = self.hasher(key)
+        index = ((key_hash * _FIBONACCI) & _MASK_64) >> self.shift
+        return key_hash, self.shards[index], self.locks[index]
+
+
+def benchmark(n = 200_000):
+    # compares memory and put / get throughput of HashMap, OpenAddressingHashMap and the built in dict
+    import time
+    import tracemalloc
+
+    keys = [f"key{i}" for i in range(n)]
+
+    def build(cls):
+        if cls is None:
+            hash_map = {}
+            for i, key in enumerate(keys):
+                hash_map[key] = i
+        else:
+            hash_map = cls()
+            for i, key in enumerate(keys):
+                hash_map.put(key, i)
+        return hash_map
+
+    cases = (("HashMap", HashMap), ("OpenAddressingHashMap", OpenAddressingHashMap), ("dict", None))
+    for name, cls in cases:
+        start = time.perf_counter()
+        hash_map = build(cls)
+        put_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if cls is None:
+            for key in keys:
+                hash_map[key]
+        else:
+            for key in keys:
+                hash_map.get(key)
+        get_time = time.perf_counter() - start
+
+        del hash_map
+        tracemalloc.start() # measured on a second build, because tracing slows the timed one down
+        hash_map = build(cls)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del hash_map
+
+        print(f"{name:>22}: {memory / n:6.1f} bytes/entry, put {n / put_time / 1e3:8.1f} K/s, get {n / get_time / 1e3:8.1f} K/s")
+
+
+def latency_benchmark(n = 2_000_000):
+    # times every single put into one growing map, the incremental rehash should keep the slowest puts short
+    # the puts that start or finish a rehash are also reported on their own, with segmented buckets they cost about as much as any other put
+    # the garbage collector is paused while we time, its pauses scan every bucket list and would hide what the map itself costs
+    # the max still includes noise from the OS (scheduling, page faults as memory grows), so the same loop over a dict is timed too
+    import gc
+    import time
+
+    hash_map = HashMap()
+    latencies = array('d', bytes(8 * n)) # allocated up front, so growing it doesnt add to the timings
+    rehash_latencies = [] # the puts that started or finished a rehash
+    clock = time.perf_counter
+    gc.disable()
+    try:
+        baseline = {}
+        baseline_max = 0
+        for i in range(n):
+            start = clock()
+            baseline[i] = i
+            baseline_max = max(baseline_max, clock() - start)
+        del baseline
+        for i in range(n):
+            rehashing = hash_map.new_buckets is not None
+            start = clock()
+            hash_map.put(i, i)
+            latencies[i] = clock() - start
+            if rehashing != (hash_map.new_buckets is not None):
+                rehash_latencies.append(latencies[i])
+    finally:
+        gc.enable()
+    latencies = sorted(latencies)
+    percentile = lambda p: latencies[min(n - 1, int(n * p))] * 1e6
+    print(f"put latency over {n} puts: p50 {percentile(0.5):.2f} us, p99 {percentile(0.99):.2f} us, "
+          f"p99.99 {percentile(0.9999):.2f} us, max {latencies[-1] * 1e3:.2f} ms, {hash_map.resizes} resizes")
+    print(f"puts that started or finished a rehash: max {max(rehash_latencies, default = 0) * 1e6:.2f} us")
+    print(f"dict baseline: max {baseline_max * 1e3:.2f} ms")
 
 if __name__ == "__main__":
     hash_map = HashMap(capacity = 32)
@@ -139,3 +1023,79 @@ if __name__ == "__main__":
 
     print(hash_map.buckets)
 
+    polynomial_map = HashMap(hash_function = 'polynomial')
+    polynomial_map.put(1, 'int')
+    polynomial_map.put('1', 'str')
+    print(polynomial_map.buckets) # 1 and '1' land in the same bucket, but they are still different keys
+
+    seeded_map = HashMap(hash_function = 'seeded')
+    seeded_map.put(1, 'int')
+    print(seeded_map.get(1.0))
+
+    batch_map = HashMap()
+    batch_map.put_many(range(0, 100, 2), range(50))
+    print(batch_map.get_many([0, 1, 2, 98], default = -1))
+    print(batch_map.contains_many([4, 5]))
+    if np is not None:
+        ids = np.arange(0, 10, dtype = np.int64)
+        print(batch_map.contains_many(ids))
+
+    growing_map = HashMap(capacity = 4)
+    for i in range(1000):
+        growing_map.put(f'key{i}', i)
+    print(len(growing_map))
+    print(growing_map.capacity)
+    print(growing_map.load_factor())
+    for i in range(990):
+        growing_map.remove(f'key{i}')
+    print(growing_map.items())
+    print(growing_map.capacity)
+
+    open_map = OpenAddressingHashMap()
+    open_map.put('name', 'Tj')
+    open_map.put('age', 30)
+    open_map.put('job', 'Programmer')
+    open_map.put('name', 'Alex')
+    open_map.remove('age')
+    print(open_map.items())
+    print('job' in open_map)
+
+    concurrent_map = ConcurrentHashMap(shards = 4)
+
+    def count_words(words):
+        for word in words:
+            concurrent_map.compute(word, lambda key, count: 1 if count is None else count + 1)
+
+    threads = [threading.Thread(target = count_words, args = (['a', 'b', 'a', 'c'] * 1000,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(sorted(concurrent_map.items()))
+    print(concurrent_map.put_if_absent('a', 0))
+    print(concurrent_map.get_or_insert('d', list))
+
+    view_map = HashMap()
+    view_map.put_many(['a', 'b', 'c'], [1, 2, 3])
+    keys = view_map.keys()
+    view_map.put('d', 4) # the view sees the new key, it isnt a copy
+    print(len(keys), 'd' in keys, ('a', 1) in view_map.items())
+    try:
+        for key in view_map:
+            view_map.remove(key)
+    except RuntimeError as error:
+        print(error)
+
+    stats_map = HashMap(hash_function = 'polynomial')
+    stats_map.enable_timing(sample_rate = 0.5)
+    for i in range(1000):
+        stats_map.put(i, i)
+        stats_map.get(i)
+    stats = stats_map.stats()
+    print(stats["max_chain_length"], stats["resizes"], stats["timings"]["get"]["samples"] > 0)
+    stats_map.disable_timing()
+
+    if "--bench" in sys.argv:
+        benchmark()
+        latency_benchmark()
+
@@ -8,12 +8,16 @@ class Node:
         self.parent = None # refrence to the parent
         self.key = key # the key of the node
         self.value = None # each node can have a value like (key : value)
+        self.size = 1 # number of nodes in the subtree of this node (itself included), used by rank and select
 
     def __repr__(self): # to print the node
         return f"({self.key}, {self.value})"
 
 
 class BinarySearchTree:
+    node_class = Node # the type of node the tree creates, the balanced tree uses nodes that also know their height
+    balanced = False # True if the height is always O(log n), bulk_insert uses it to pick the cheaper way in
+
     def __init__(self):
         self.root = None # the root node of the full tree
 
@@ -28,6 +32,10 @@ class BinarySearchTree:
                 return True 
         return False
 
+    # O(1) - the root knows the size of its subtree, which is the whole tree
+    def __len__(self):
+        return _size(self.root)
+
     # O(n) - because we need to iterate over all the elements / nodes
     def __iter__(self): # this is a dunder method to iterate over the tree
         yield from self._in_order_traversal(self.root)
@@ -38,24 +46,26 @@ class BinarySearchTree:
 
     def insert(self, key, value):
         if self.root is None: # if the tree is empty
-            self.root = Node(key)
+            self.root = self.node_class(key)
             self.root.value = value
         else: # if the tree isnt empty
             current_node = self.root
             while True:
                 if key < current_node.key: # if key is less we check left
                     if current_node.left is None: # if the left node is empty we create it
-                        current_node.left = Node(key)
+                        current_node.left = self.node_class(key)
                         current_node.left.value = value
                         current_node.left.parent = current_node
+                        self._fix_up(current_node) # the tree below current_node changed
                         break
                     else: # if it isnt empty and key is still < current_node, we continue moving left
                         current_node = current_node.left
                 elif key > current_node.key: # if key is greater we check right
                     if current_node.right is None: # if the right node is empty we create it
-                        current_node.right = Node(key)
+                        current_node.right = self.node_class(key)
                         current_node.right.value = value
                         current_node.right.parent = current_node
+                        self._fix_up(current_node) # the tree below current_node changed
                         break
                     else: # if it isnt empty and key is still > current_node, we continue moving right
                         current_node = current_node.right
@@ -96,19 +106,153 @@ class BinarySearchTree:
         else:
             raise ValueError('Unknown order')
 
+    # O(n) - it visits every node, level by level
+    def height(self): # number of nodes on the longest path from the root down to a leaf
+        height = 0
+        level = [self.root] if self.root is not None else []
+        while level:
+            height += 1
+            level = [child for node in level for child in (node.left, node.right) if child is not None]
+        return height
+
+    # Order statistics - every node knows the size of its subtree, so at each node we know how many keys are on its left
+    # that lets us count and index keys by walking one path from the root: O(h), which is O(log n) for the AVL tree
+
+    # O(h)
+    def rank(self, key): # how many keys are smaller than key
+        rank = 0
+        current_node = self.root
+        while current_node is not None:
+            if key <= current_node.key:
+                current_node = current_node.left
+            else: # current node and its whole left subtree are smaller than key
+                rank += _size(current_node.left) + 1
+                current_node = current_node.right
+        return rank
+
+    # O(h)
+    def select(self, k): # the k-th smallest (key, value), k starts at 0
+        if not 0 <= k < len(self):
+            raise IndexError('Index out of bounds')
+        current_node = self.root
+        while True:
+            left_size = _size(current_node.left)
+            if k < left_size: # it is in the left subtree
+                current_node = current_node.left
+            elif k == left_size: # exactly k keys are smaller than this node
+                return (current_node.key, current_node.value)
+            else: # skip the left subtree and this node
+                k -= left_size + 1
+                current_node = current_node.right
+
+    # O(h)
+    def count_range(self, lo, hi): # how many keys are in [lo, hi)
+        return max(0, self.rank(hi) - self.rank(lo))
+
+    # O(h + k) - where k is the number of keys yielded
+    def range(self, lo, hi): # yields the (key, value) of the keys in [lo, hi) in order
+        # find the first node with a key >= lo, then keep stepping to the next node in order until the key reaches hi
+        # only the nodes on the path down and the nodes in the range are visited
+        node = self._lower_bound(lo)
+        while node is not None and node.key < hi:
+            yield (node.key, node.value)
+            node = self._next_node(node)
+
+    # Bulk loading - when the keys are already sorted we dont need to search for their place one by one
+    # the middle key becomes the root, the middle of the left half its left child, and so on, which gives a perfectly balanced tree in O(n)
+
+    # O(n)
+    @classmethod
+    def from_sorted(cls, pairs): # builds a tree from (key, value) pairs sorted by key, for a repeated key the last value wins
+        tree = cls()
+        tree.root = tree._build(_unique_sorted(pairs))
+        return tree
+
+    # O(n + m) - n and m are the sizes of the two trees
+    def merge(self, other): # adds all the keys of other to this tree, for a key in both trees the value of other wins
+        # both in order walks are already sorted, so we merge them like merge sort does and rebuild the tree from the result
+        self.root = self._build(_merge_sorted(list(self), list(other)))
+
+    # O(k log k + n) or O(k log k + k log n) - k is the number of pairs and n the size of the tree
+    def bulk_insert(self, pairs): # inserts a batch of (key, value) pairs, in any order
+        # the batch is sorted first (a stable sort, so for a repeated key the last value wins)
+        # in a balanced tree a small batch is cheaper to insert one by one, and log n (the bit length of n) bounds the cost of each insert
+        # a large batch, or any batch for a tree that isnt balanced (its height can be n), is merged with the tree and the tree is rebuilt
+        batch = sorted(pairs, key = lambda pair: pair[0])
+        if self.balanced and len(batch) * max(1, len(self).bit_length()) < len(self):
+            for key, value in batch:
+                self.insert(key, value)
+        else:
+            self.root = self._build(_merge_sorted(list(self), list(_unique_sorted(batch))))
+
+    # O(1)
+    def cursor(self): # a TreeCursor on this tree, call seek, first or last to place it
+        return TreeCursor(self)
+
     # Below are the helper private functions required by the main functions
 
+    # O(n)
+    def _build(self, pairs): # returns the root of a perfectly balanced tree built from sorted, unique (key, value) pairs
+        pairs = list(pairs)
+
+        def build(lo, hi, parent): # builds the subtree of pairs[lo:hi], the recursion is only log n deep
+            if lo >= hi:
+                return None
+            middle = (lo + hi) // 2
+            node = self.node_class(pairs[middle][0])
+            node.value = pairs[middle][1]
+            node.parent = parent
+            node.left = build(lo, middle, node)
+            node.right = build(middle + 1, hi, node)
+            self._update(node) # the children are done, so the size (and height) can be computed
+            return node
+        return build(0, len(pairs), None)
+
+    def _fix_up(self, node): # called with the lowest node whose subtree changed after an insert or delete, updates the sizes up to the root
+        while node is not None:
+            self._update(node)
+            node = node.parent
+
+    # O(1)
+    def _update(self, node): # recomputes the data a node keeps about its subtree from its children
+        node.size = 1 + _size(node.left) + _size(node.right)
+
+    # O(h)
+    def _lower_bound(self, key): # the node with the smallest key >= key, or None
+        result = None
+        current_node = self.root
+        while current_node is not None:
+            if current_node.key >= key: # a candidate, but there might be a smaller one on the left
+                result = current_node
+                current_node = current_node.left
+            else:
+                current_node = current_node.right
+        return result
+
+    # O(h) - worst case, O(1) amortized over a full walk
+    def _next_node(self, node): # the node that comes after node in order, using the parent links
+        if node.right is not None: # the smallest node of the right subtree
+            node = node.right
+            while node.left is not None:
+                node = node.left
+            return node
+        while node.parent is not None and node is node.parent.right: # go up until we come from a left child
+            node = node.parent
+        return node.parent
+
     def _delete(self, node): # used by delete to search and find the Node to delete
         # Node is a leaf node
         if node.left is None and node.right is None:
             if node.parent is None: # if we want to delete the root node itself
                 self.root = None
             else: # we need to check if we need to delete the right or left node from the parent node persepective
+                parent = node.parent
                 if node.parent.right == node:
                     node.parent.right = None
                 else:
                     node.parent.left = None
                 node.parent = None # we do this to remove the reference of the deleted node to its parent
+                self._fix_up(parent) # the tree below the parent changed
         # Node has one child node
         elif node.left is None or node.right is None:
             child_node = node.left if node.left is not None else node.right # to find is the single child is a left or right node
@@ -121,6 +265,7 @@ class BinarySearchTree:
                 else:
                     node.parent.left = child_node
                 child_node.parent = node.parent
+                self._fix_up(node.parent) # the tree below the parent changed
             node.parent = node.left = node.right = None
         # Node has two child nodes
         else:
@@ -136,7 +281,7 @@ class BinarySearchTree:
             return None 
         else: # To find the successor we check right and move there and we traverse all the way down the left to get the last node element (easier to visualize with a diagram)
             current_node = node.right
-            while node.left is not None:
+            while current_node.left is not None:
                 current_node = current_node.left
             return current_node
             
@@ -148,31 +293,268 @@ class BinarySearchTree:
             return None 
         else: # To find the predecessor we check left and move there and we traverse all the way down the right to get the last node element (easier to visualize with a diagram)
             current_node = node.left
-            while node.right is not None:
+            while current_node.right is not None:
                 current_node = current_node.right
             return current_node
 
-    def _in_order_traversal(self, node): # used by traverse as its parameter value, (left -> root -> right) this should print the node keys in ascending order
-        if node is not None:
-            yield from self._in_order_traversal(node.left) # recursive call to yield the left subtree
-            yield (node.key, node.value) # yield the root node
-            yield from self._in_order_traversal(node.right) # recursive call to yield the right subtree
+    # The traversals dont use recursion, they walk the tree with the parent links and remember only where they came from:
+    # coming down from the parent -> we see the node for the first time (pre order), then go left
+    # coming up from the left child -> we are done with the left subtree (in order), then go right
+    # coming up from the right child -> we are done with both subtrees (post order), then go up
+    # every edge is walked once down and once up, so a full traversal is O(n) with O(1) extra memory, and deep trees cant hit the recursion limit
 
+    def _in_order_traversal(self, node): # used by traverse as its parameter value, (left -> root -> right) this should print the node keys in ascending order
+        return self._walk(node, 'inorder')
 
     def _pre_order_traversal(self, node): # used by traverse as its parameter value, (root -> left -> right)
-        if node is not None:
-            yield (node.key, node.value) # yield the root node
-            yield from self._pre_order_traversal(node.left) # recursive call to yield the left subtree
-            yield from self._pre_order_traversal(node.right) # recursive call to yield the right subtree
+        return self._walk(node, 'preorder')
 
     def _post_order_traversal(self, node): # used by traverse as its parameter value, (left -> right -> root)
-        if node is not None:
-            yield from self._post_order_traversal(node.left) # recursive call to yield the left subtree
-            yield from self._post_order_traversal(node.right) # recursive call to yield the right subtree
-            yield (node.key, node.value) # yield the root node
-            
+        return self._walk(node, 'postorder')
+
+    # O(n) - n is the number of nodes in the subtree
+    def _walk(self, root, order): # yields (key, value) of the subtree of root in the given order
+        if root is None:
+            return
+        previous = root.parent
+        node = root
+        while True:
+            if previous is node.parent: # coming down
+                if order == 'preorder':
+                    yield (node.key, node.value)
+                if node.left is not None:
+                    previous, node = node, node.left
+                    continue
+                previous = node.left # there is no left subtree, so we act as if we just came up from it
+            if previous is node.left: # coming up from the left subtree
+                if order == 'inorder':
+                    yield (node.key, node.value)
+                if node.right is not None:
+                    previous, node = node, node.right
+                    continue
+            # coming up from the right subtree (or there is none)
+            if order == 'postorder':
+                yield (node.key, node.value)
+            if node is root: # we are back at the top of the subtree
+                return
+            previous, node = node, node.parent
+
+    # O(h) - worst case, O(1) amortized over a full walk
+    def _previous_node(self, node): # the node that comes before node in order, the mirror image of _next_node
+        if node.left is not None:
+            node = node.left
+            while node.right is not None:
+                node = node.right
+            return node
+        while node.parent is not None and node is node.parent.left:
+            node = node.parent
+        return node.parent
+
+
+# Cursor - a position in the tree that can move forwards and backwards in key order
+# it only holds a node, and each step follows the parent and child links, so a step is O(1) amortized and O(h) at worst
+# inserting or deleting keys can move the nodes around, so a cursor should be seeked again after the tree changes
+
+class TreeCursor:
+    def __init__(self, tree):
+        self.tree = tree
+        self.node = None # the node the cursor is on, None if it is outside the tree
+        self.outside = None # 'before' the first key or 'after' the last key when node is None, so we can step back in
+
+    # O(h)
+    def seek(self, key): # moves to the first key >= key and returns its (key, value), or None if there is no such key
+        self.node = self.tree._lower_bound(key)
+        self.outside = 'after' if self.node is None else None
+        return self.current()
+
+    # O(h)
+    def first(self): # moves to the smallest key
+        self.node = self.tree.root
+        while self.node is not None and self.node.left is not None:
+            self.node = self.node.left
+        self.outside = 'before' if self.node is None else None
+        return self.current()
+
+    # O(h)
+    def last(self): # moves to the largest key
+        self.node = self.tree.root
+        while self.node is not None and self.node.right is not None:
+            self.node = self.node.right
+        self.outside = 'after' if self.node is None else None
+        return self.current()
+
+    # O(1)
+    def current(self):
+        return (self.node.key, self.node.value) if self.node is not None else None
+
+    # O(1) - amortized
+    def next(self): # moves to the next key and returns its (key, value), or None after the last key
+        if self.node is not None:
+            self.node = self.tree._next_node(self.node)
+            if self.node is None:
+                self.outside = 'after'
+        elif self.outside == 'before': # stepping back in from before the first key
+            return self.first()
+        return self.current()
+
+    # O(1) - amortized
+    def prev(self): # moves to the previous key and returns its (key, value), or None before the first key
+        if self.node is not None:
+            self.node = self.tree._previous_node(self.node)
+            if self.node is None:
+                self.outside = 'before'
+        elif self.outside == 'after': # stepping back in from after the last key
+            return self.last()
+        return self.current()
+
+
+# AVL tree - a binary search tree that keeps itself balanced, so search, insert and delete are always O(log n)
+# every node stores its height, and the balance factor of a node is height(left) - height(right)
+# after an insert or delete we walk up from the changed node to the root, and wherever the balance factor becomes 2 or -2
+# we rotate the nodes to bring it back to -1, 0 or 1. Without this, sorted keys would build a tree that is just a linked list
+
+# Rotate right around x (rotate left is the mirror image):
+#       x             y
+#      / \           / \
+#     y   C   ->    A   x
+#    / \               / \
+#   A   B             B   C
+
+class AVLNode(Node):
+    def __init__(self, key):
+        super().__init__(key)
+        self.height = 1 # a new node is a leaf
+
+
+class AVLTree(BinarySearchTree):
+    node_class = AVLNode
+    balanced = True
+
+    # O(1) - the root knows its height
+    def height(self):
+        return _height(self.root)
+
+    # O(log n) - at most one rotation per node on the path up
+    def _fix_up(self, node):
+        while node is not None:
+            self._update(node)
+            balance = _height(node.left) - _height(node.right)
+            if balance > 1: # the left side is too tall
+                if _height(node.left.left) < _height(node.left.right): # left right case, first turn it into a left left case
+                    self._rotate_left(node.left)
+                node = self._rotate_right(node)
+            elif balance < -1: # the right side is too tall
+                if _height(node.right.right) < _height(node.right.left): # right left case, first turn it into a right right case
+                    self._rotate_right(node.right)
+                node = self._rotate_left(node)
+            node = node.parent
+
+    # O(1)
+    def _update(self, node): # the size is kept by the BinarySearchTree, and we also keep the height
+        super()._update(node)
+        node.height = 1 + max(_height(node.left), _height(node.right))
+
+    # O(1)
+    def _rotate_left(self, node): # the right child takes the place of node, returns the new top of this subtree
+        child = node.right
+        node.right = child.left
+        if child.left is not None:
+            child.left.parent = node
+        self._replace_child(node, child)
+        child.left = node
+        node.parent = child
+        self._update(node)
+        self._update(child)
+        return child
+
+    # O(1)
+    def _rotate_right(self, node): # the left child takes the place of node, returns the new top of this subtree
+        child = node.left
+        node.left = child.right
+        if child.right is not None:
+            child.right.parent = node
+        self._replace_child(node, child)
+        child.right = node
+        node.parent = child
+        self._update(node)
+        self._update(child)
+        return child
+
+    # O(1)
+    def _replace_child(self, node, new_node): # puts new_node where node hangs from its parent
+        new_node.parent = node.parent
+        if node.parent is None:
+            self.root = new_node
+        elif node.parent.left is node:
+            node.parent.left = new_node
+        else:
+            node.parent.right = new_node
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+# O(n)
+def _unique_sorted(pairs): # checks that the pairs are sorted by key, and keeps only the last pair of a repeated key
+    previous = None
+    for pair in pairs:
+        if previous is not None:
+            if pair[0] < previous[0]:
+                raise ValueError('Keys are not sorted')
+            if not previous[0] < pair[0]: # the same key again, the later value wins
+                previous = pair
+                continue
+            yield previous
+        previous = pair
+    if previous is not None:
+        yield previous
+
+
+# O(n + m)
+def _merge_sorted(first, second): # merges two sorted lists of unique (key, value) pairs, for a key in both the pair from second wins
+    i = j = 0
+    while i < len(first) and j < len(second):
+        if first[i][0] < second[j][0]:
+            yield first[i]
+            i += 1
+        elif second[j][0] < first[i][0]:
+            yield second[j]
+            j += 1
+        else:
+            yield second[j]
+            i += 1
+            j += 1
+    yield from first[i:]
+    yield from second[j:]
+
+
+def benchmark(n = 1_000_000):
+    # inserts n sorted keys, a plain BinarySearchTree becomes a linked list (O(n^2) in total), so it only gets a few thousand
+    import time
+
+    for cls, count in ((BinarySearchTree, min(n, 5_000)), (AVLTree, n)):
+        tree = cls()
+        start = time.perf_counter()
+        for key in range(count):
+            tree.insert(key, None)
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in range(0, count, max(1, count // 10_000)):
+            tree.search(key)
+        search_time = (time.perf_counter() - start) / len(range(0, count, max(1, count // 10_000)))
+
+        print(f"{cls.__name__:>16}: {count:>9} sorted inserts in {elapsed:6.2f} s, height {tree.height():>5}, search {search_time * 1e6:8.2f} us")
+
 
 if __name__ == "__main__":
+    import sys
+
     bst = BinarySearchTree()
 
     bst.insert(10, 'hello')
@@ -195,4 +577,35 @@ if __name__ == "__main__":
 
     print(bst)
 
-    print(bst.search(30))
\ No newline at end of file
+    print(bst.search(30))
+
+    avl = AVLTree()
+    for key in range(1, 16):
+        avl.insert(key, 'hello')
+    avl.delete(8)
+    print(avl.height())
+    print(avl)
+    print(avl.rank(8))
+    print(avl.select(7))
+    print(avl.count_range(3, 12))
+    print(list(avl.range(3, 6)))
+
+    cursor = avl.cursor()
+    print(cursor.seek(8))
+    print(cursor.next())
+    print(cursor.prev())
+    print(cursor.prev())
+
+    loaded = AVLTree.from_sorted((key, key * key) for key in range(10))
+    loaded.merge(BinarySearchTree.from_sorted([(5, 'five'), (20, 'twenty')]))
+    loaded.bulk_insert([(15, 'fifteen'), (-1, 'minus one')])
+    print(loaded.height())
+    print(loaded)
+
+    deep_tree = BinarySearchTree()
+    for key in range(5000): # sorted keys make a tree 5000 levels deep, the traversals dont recurse so this works
+        deep_tree.insert(key, None)
+    print(sum(1 for _ in deep_tree.traverse('postorder')))
+
+    if "--bench" in sys.argv:
+        benchmark()
\ No newline at end of file